@@ -0,0 +1,71 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+ACCEPT_ENCODING_ITEM = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def accepted_encodings(header):
+    '''
+    Content codings of an Accept-Encoding header with a non-zero quality.
+    '''
+    encodings = set()
+    for item in header.split(','):
+        match = ACCEPT_ENCODING_ITEM.fullmatch(item)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            encodings.add(match.group(1).lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    '''
+    Compress responses of at least RESPONSE_COMPRESSION_MIN_BYTES with brotli
+    (when the brotli package is installed and the client accepts it) or gzip.
+
+    Small bodies are left alone: compressing them costs more CPU than it saves bytes.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in encodings:
+            encoding = 'br'
+            content = brotli.compress(response.content, quality=settings.RESPONSE_BROTLI_QUALITY)
+        elif 'gzip' in encodings:
+            encoding = 'gzip'
+            content = compress_string(response.content)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # The body differs from the uncompressed one, so a strong ETag has to become weak (as GZipMiddleware does).
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,108 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+
+class RateLimitStore:
+    '''
+    GCRA (generic cell rate algorithm) state in a SQLite file shared by all processes of the host.
+
+    Each key stores one number, its theoretical arrival time (TAT), so a check costs
+    one row read and one row write whatever the rate. Updates run in
+    BEGIN IMMEDIATE transactions, which serializes them across processes.
+    '''
+    # Roughly one call in this many also deletes keys that have fully recovered.
+    cleanup_every = 1000
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def get_connection(self):
+        # One connection per thread; a forked child opens its own instead of sharing the parent's.
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS rate_limit (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def acquire(self, key, emission_interval, burst, cost=1, now=None):
+        '''
+        Take `cost` units from the bucket of `key` if it has them.
+
+        Args:
+            key (str): Throttle key, e.g. scope and user id.
+            emission_interval (float): Seconds after which one unit is available again.
+            burst (int): Units available at once after a quiet period.
+            cost (float): Units this request takes.
+            now (float): Current time, defaults to time.time().
+
+        Returns:
+            tuple: (allowed, seconds to wait before the request would be allowed)
+        '''
+        now = time.time() if now is None else now
+        connection = self.get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tat FROM rate_limit WHERE key = ?', (key,)).fetchone()
+            tat = max(row[0], now) if row else now
+            new_tat = tat + emission_interval * cost
+            allow_at = new_tat - emission_interval * burst
+            if now < allow_at:
+                connection.execute('COMMIT')
+                return False, allow_at - now
+            connection.execute(
+                'INSERT INTO rate_limit (key, tat) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET tat = excluded.tat',
+                (key, new_tat),
+            )
+            if random.randrange(self.cleanup_every) == 0:
+                connection.execute('DELETE FROM rate_limit WHERE tat < ?', (now,))
+            connection.execute('COMMIT')
+            return True, 0.0
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def refund(self, key, emission_interval, cost=1, now=None):
+        '''
+        Give back `cost` units taken by acquire for a request that was not carried out.
+        A bucket never holds more than a full burst, so a refund after the units came back does nothing.
+        '''
+        now = time.time() if now is None else now
+        connection = self.get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'UPDATE rate_limit SET tat = MAX(tat - ?, ?) WHERE key = ?',
+                (emission_interval * cost, now, key),
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def reset(self, key):
+        self.get_connection().execute('DELETE FROM rate_limit WHERE key = ?', (key,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_rate_limit_store():
+    '''
+    The store at settings.RATE_LIMIT_DB_PATH, created on first use.
+    '''
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RateLimitStore(settings.RATE_LIMIT_DB_PATH)
+        return _store
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 '''
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +91,25 @@ DATABASES = {
     }
 }
 
+# DB_PROFILE=production tunes SQLite for concurrent web and job workers: WAL lets readers run
+# while a generation job writes, write transactions take the lock up front (BEGIN IMMEDIATE)
+# instead of failing on upgrade, and connections are kept for CONN_MAX_AGE seconds.
+
+if os.getenv('DB_PROFILE') == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA busy_timeout=5000;'
+            'PRAGMA cache_size=-20000;'
+            'PRAGMA mmap_size=134217728;'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -136,6 +157,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'core.throttling.AnonStrictThrottle',
         'core.throttling.UserStandardThrottle',
@@ -168,6 +193,190 @@ YDL_OPTS = {
     'outtmpl': 'media/subtitles/%(id)s.%(ext)s',
 }
 
+YDL_AUDIO_OPTS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'noplaylist': True,
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android'],
+            'player_skip': ['webpage', 'configs', 'js'],
+        }
+    },
+    'headers': {
+        'User-Agent': 'Mozilla/5.0 (Linux; Android 10; SM-G981B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36',
+    },
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'quizz_app': {
+            'handlers': ['console'],
+            'level': os.getenv('QUIZLY_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+
+# Whisper transcription
+# WHISPER_PRELOAD_MODELS is a comma separated list of model sizes loaded when a worker starts.
+
+WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'small')
+WHISPER_DEVICE = os.getenv('WHISPER_DEVICE') or None
+WHISPER_PRELOAD_MODELS = [size for size in os.getenv('WHISPER_PRELOAD_MODELS', '').split(',') if size]
+
+# With more than one worker, audio longer than two segments is split at silences
+# and the segments are transcribed in a process pool.
+WHISPER_PARALLEL_WORKERS = int(os.getenv('WHISPER_PARALLEL_WORKERS', '0'))
+WHISPER_SEGMENT_SECONDS = int(os.getenv('WHISPER_SEGMENT_SECONDS', '120'))
+
+# Adaptive model size: each job uses the largest model up to WHISPER_MODEL_SIZE whose estimated transcription time
+# (audio length x real-time factor of the model, stretched by the queued jobs) stays within WHISPER_LATENCY_TARGET_SECONDS.
+# WHISPER_REALTIME_FACTORS are seconds of transcription per second of audio, e.g. "tiny=0.03,base=0.06,small=0.2".
+
+WHISPER_ADAPTIVE_MODEL = os.getenv('WHISPER_ADAPTIVE_MODEL', 'True') == 'True'
+WHISPER_LATENCY_TARGET_SECONDS = int(os.getenv('WHISPER_LATENCY_TARGET_SECONDS', '300'))
+WHISPER_REALTIME_FACTORS = {
+    size: float(factor)
+    for size, factor in (
+        pair.split('=') for pair in os.getenv('WHISPER_REALTIME_FACTORS', 'tiny=0.03,base=0.06,small=0.2,medium=0.6,large=1.2').split(',') if pair
+    )
+}
+
+# Voice-activity trimming: before transcription, pauses of at least VAD_MIN_SILENCE_SECONDS (frames quieter than
+# the noise floor + VAD_THRESHOLD_DB) are shortened to VAD_KEEP_SILENCE_SECONDS so Whisper skips silence and dead air.
+# Frames below VAD_FLOOR_DB dBFS are always silence; recordings whose noise floor is within VAD_MIN_CONTRAST_DB
+# of their median level (music beds, constant noise) are only trimmed below that floor.
+
+VAD_TRIM = os.getenv('VAD_TRIM', 'True') == 'True'
+VAD_THRESHOLD_DB = float(os.getenv('VAD_THRESHOLD_DB', '12'))
+VAD_MIN_SILENCE_SECONDS = float(os.getenv('VAD_MIN_SILENCE_SECONDS', '1.0'))
+VAD_KEEP_SILENCE_SECONDS = float(os.getenv('VAD_KEEP_SILENCE_SECONDS', '0.3'))
+VAD_FLOOR_DB = float(os.getenv('VAD_FLOOR_DB', '-55'))
+VAD_MIN_CONTRAST_DB = float(os.getenv('VAD_MIN_CONTRAST_DB', '6'))
+
+# TRANSCRIPTION_BACKEND=service sends audio to the transcription service (manage.py run_transcription_server)
+# over the Unix socket TRANSCRIPTION_SERVICE_SOCKET, so only that process holds the Whisper model;
+# 'local' loads the model in every worker process.
+
+TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'local')
+TRANSCRIPTION_SERVICE_SOCKET = os.getenv('TRANSCRIPTION_SERVICE_SOCKET', os.path.join(tempfile.gettempdir(), 'quizly_transcription.sock'))
+TRANSCRIPTION_SERVICE_AUTHKEY = os.getenv('TRANSCRIPTION_SERVICE_AUTHKEY')
+TRANSCRIPTION_SERVICE_TIMEOUT = int(os.getenv('TRANSCRIPTION_SERVICE_TIMEOUT', '3600'))
+
+# Preflight: video metadata is read once without downloading and kept PREFLIGHT_TTL_SECONDS for the download.
+# Playlists, live streams, videos longer than MAX_VIDEO_MINUTES and videos without audio are rejected up front;
+# the smallest audio-only format of at least AUDIO_MIN_BITRATE_KBPS is downloaded, YDL_CONCURRENT_FRAGMENTS fragments at a time.
+
+MAX_VIDEO_MINUTES = int(os.getenv('MAX_VIDEO_MINUTES', '180'))
+AUDIO_MIN_BITRATE_KBPS = int(os.getenv('AUDIO_MIN_BITRATE_KBPS', '48'))
+PREFLIGHT_TTL_SECONDS = int(os.getenv('PREFLIGHT_TTL_SECONDS', '600'))
+YDL_CONCURRENT_FRAGMENTS = int(os.getenv('YDL_CONCURRENT_FRAGMENTS', '4'))
+
+# Concurrent requests for one video share a single download and transcription;
+# processes coordinate through lock files in SINGLE_FLIGHT_LOCK_DIR.
+
+SINGLE_FLIGHT_LOCK_DIR = os.getenv('SINGLE_FLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'quizly_single_flight'))
+
+# Outputs of the pipeline stages (metadata, downloaded audio, model output, parsed quiz) are checkpointed
+# for PIPELINE_CHECKPOINT_TTL_SECONDS, so a retried job resumes after the last stage that completed.
+
+PIPELINE_CHECKPOINT_TTL_SECONDS = int(os.getenv('PIPELINE_CHECKPOINT_TTL_SECONDS', '86400'))
+
+# Scratch space: every audio download gets its own directory under SCRATCH_ROOT (point it at a tmpfs such as
+# /dev/shm/quizly to keep the audio in memory). Downloads wait up to SCRATCH_QUOTA_WAIT_SECONDS while the
+# directories would exceed SCRATCH_QUOTA_MB, and directories untouched for SCRATCH_MAX_AGE_SECONDS (by default
+# as long as the audio checkpoints live) are swept every SCRATCH_SWEEP_INTERVAL_SECONDS.
+
+SCRATCH_ROOT = os.getenv('SCRATCH_ROOT', str(BASE_DIR / 'media' / 'scratch'))
+SCRATCH_QUOTA_BYTES = int(os.getenv('SCRATCH_QUOTA_MB', '2048')) * 1024 * 1024
+SCRATCH_QUOTA_WAIT_SECONDS = int(os.getenv('SCRATCH_QUOTA_WAIT_SECONDS', '300'))
+SCRATCH_MAX_AGE_SECONDS = int(os.getenv('SCRATCH_MAX_AGE_SECONDS', str(PIPELINE_CHECKPOINT_TTL_SECONDS)))
+SCRATCH_SWEEP_INTERVAL_SECONDS = int(os.getenv('SCRATCH_SWEEP_INTERVAL_SECONDS', '600'))
+
+# Captions listed by YDL_OPTS are used as transcript when they contain at least CAPTIONS_MIN_WORDS words,
+# audio is only downloaded and transcribed with Whisper otherwise.
+
+CAPTIONS_FIRST = os.getenv('CAPTIONS_FIRST', 'True') == 'True'
+CAPTIONS_MIN_WORDS = int(os.getenv('CAPTIONS_MIN_WORDS', '50'))
+
+# 'file' downloads the audio and converts it to mp3 before transcription,
+# 'stream' decodes the audio stream with ffmpeg straight into 16 kHz PCM chunks of AUDIO_STREAM_CHUNK_SECONDS.
+
+AUDIO_PIPELINE_MODE = os.getenv('AUDIO_PIPELINE_MODE', 'file')
+AUDIO_STREAM_CHUNK_SECONDS = int(os.getenv('AUDIO_STREAM_CHUNK_SECONDS', '300'))
+
+# Transcripts are cached per video in the database, least recently used entries are evicted first.
+
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Quiz generation with Gemini. Transcripts longer than QUIZ_CHUNK_TOKENS tokens are split into chunks,
+# questions are generated per chunk (QUIZ_LLM_CONCURRENCY calls at a time) and merged. Questions failing
+# validation are dropped; a quiz with fewer than QUIZ_MIN_QUESTIONS valid questions fails.
+
+QUIZ_QUESTION_COUNT = int(os.getenv('QUIZ_QUESTION_COUNT', '10'))
+QUIZ_MIN_QUESTIONS = int(os.getenv('QUIZ_MIN_QUESTIONS', '5'))
+QUIZ_CHUNK_TOKENS = int(os.getenv('QUIZ_CHUNK_TOKENS', '6000'))
+QUIZ_LLM_CONCURRENCY = int(os.getenv('QUIZ_LLM_CONCURRENCY', '4'))
+QUIZ_TOKEN_ENCODING = os.getenv('QUIZ_TOKEN_ENCODING', 'cl100k_base')
+
+# 'gemini' or 'fake' (in-process quizzes after QUIZ_LLM_FAKE_LATENCY seconds, for load tests and CI).
+# GEMINI_BASE_URL points the Gemini client at another server, e.g. `manage.py fake_llm_server`.
+QUIZ_LLM_BACKEND = os.getenv('QUIZ_LLM_BACKEND', 'gemini')
+QUIZ_LLM_FAKE_LATENCY = float(os.getenv('QUIZ_LLM_FAKE_LATENCY', '0'))
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL') or None
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '120'))
+GEMINI_MAX_ATTEMPTS = int(os.getenv('GEMINI_MAX_ATTEMPTS', '4'))
+
+# Quiz generation jobs run on a thread pool inside each web worker process. The process touches the rows of its
+# jobs every QUIZ_JOB_HEARTBEAT_SECONDS; pending or running jobs without a heartbeat for QUIZ_JOB_STALE_SECONDS
+# were lost with their process (restart, crash) and are marked as failed, so they can be retried.
+
+QUIZ_JOB_WORKERS = int(os.getenv('QUIZ_JOB_WORKERS', '2'))
+QUIZ_JOB_HEARTBEAT_SECONDS = int(os.getenv('QUIZ_JOB_HEARTBEAT_SECONDS', '60'))
+QUIZ_JOB_STALE_SECONDS = int(os.getenv('QUIZ_JOB_STALE_SECONDS', '300'))
+
+# Admission control: each generation request is charged its video's audio minutes against a per-user
+# budget refilled over a day, requests are refused with 503 while GENERATION_QUEUE_LIMIT jobs are queued,
+# and at most TRANSCRIPTION_SLOTS Whisper transcriptions run on the host at once.
+
+AUDIO_MINUTES_PER_DAY = int(os.getenv('AUDIO_MINUTES_PER_DAY', '180'))
+GENERATION_QUEUE_LIMIT = int(os.getenv('GENERATION_QUEUE_LIMIT', '8'))
+TRANSCRIPTION_SLOTS = int(os.getenv('TRANSCRIPTION_SLOTS', '2'))
+TRANSCRIPTION_SLOTS_DIR = os.getenv('TRANSCRIPTION_SLOTS_DIR', os.path.join(tempfile.gettempdir(), 'quizly_transcription_slots'))
+
+# GETs on quizzes/ and quizzes/<pk>/ are cached per user in the 'responses' cache.
+# It has to be shared by all worker processes, since writes invalidate it through version counters.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'quizly_response_cache')),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300')),
+    },
+}
+
+# Throttle state (core/rate_limit.py) lives in this SQLite file, shared by all processes on the host.
+
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', os.path.join(tempfile.gettempdir(), 'quizly_rate_limit.sqlite3'))
+
+# Responses of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with brotli (pinned in requirements.txt)
+# for clients accepting it, gzip otherwise. Without the brotli package only gzip is used.
+
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', '4'))
+
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5500",
     "http://localhost:5500",
@@ -179,5 +388,6 @@ CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
     "x-csrftoken",
+    "idempotency-key",
 ]
 
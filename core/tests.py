@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.rate_limit import RateLimitStore
+from core.throttling import AIGenerationThrottle, AnonStrictThrottle, AuthBurstThrottle, UserStandardThrottle
+
+
+def take_units(path, key, attempts, start_event, results):
+    '''
+    Worker process: try `attempts` acquisitions on one key and report how many were allowed.
+    '''
+    store = RateLimitStore(path)
+    start_event.wait()
+    allowed = sum(store.acquire(key, emission_interval=3600, burst=100)[0] for _ in range(attempts))
+    results.put(allowed)
+
+
+class RateLimitStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'rate_limit.sqlite3')
+        self.store = RateLimitStore(self.path)
+
+    def test_burst_then_one_per_interval(self):
+        now = 1000.0
+        for _ in range(3):
+            self.assertEqual(self.store.acquire('user:1', emission_interval=10, burst=3, now=now), (True, 0.0))
+        allowed, wait = self.store.acquire('user:1', emission_interval=10, burst=3, now=now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 10)
+        self.assertTrue(self.store.acquire('user:1', emission_interval=10, burst=3, now=now + 10)[0])
+        self.assertFalse(self.store.acquire('user:1', emission_interval=10, burst=3, now=now + 10)[0])
+        self.assertTrue(self.store.acquire('user:2', emission_interval=10, burst=3, now=now)[0])
+
+    def test_cost_takes_several_units(self):
+        self.assertTrue(self.store.acquire('minutes', emission_interval=1, burst=10, cost=8, now=0)[0])
+        allowed, wait = self.store.acquire('minutes', emission_interval=1, burst=10, cost=5, now=0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 3)
+
+    def test_refund_gives_units_back(self):
+        self.assertTrue(self.store.acquire('minutes', emission_interval=1, burst=10, cost=8, now=0)[0])
+        self.store.refund('minutes', emission_interval=1, cost=8, now=0)
+        self.assertTrue(self.store.acquire('minutes', emission_interval=1, burst=10, cost=10, now=0)[0])
+        self.store.refund('minutes', emission_interval=1, cost=50, now=0)
+        self.assertFalse(self.store.acquire('minutes', emission_interval=1, burst=10, cost=11, now=0)[0])
+
+    def test_limit_holds_across_processes(self):
+        context = multiprocessing.get_context('spawn')
+        start_event = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=take_units, args=(self.path, 'shared', 100, start_event, results))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        start_event.set()
+        reports = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join(timeout=60)
+
+        self.assertEqual(sum(reports), 100)
+
+
+class GCRAThrottleTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = RateLimitStore(os.path.join(directory.name, 'rate_limit.sqlite3'))
+        patcher = mock.patch('core.throttling.get_rate_limit_store', return_value=store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def admitted_times(self, throttle_class, step, windows):
+        throttle = throttle_class()
+        throttle.get_cache_key = lambda request, view: throttle_class.__name__
+        now = 0.0
+        admitted = []
+        while now < windows * throttle.duration:
+            throttle.timer = lambda: now
+            if throttle.allow_request(None, None):
+                admitted.append(now)
+            now += step
+        return throttle, admitted
+
+    def test_no_window_admits_more_than_the_rate(self):
+        for throttle_class in (AuthBurstThrottle, AIGenerationThrottle, AnonStrictThrottle, UserStandardThrottle):
+            with self.subTest(throttle=throttle_class.__name__):
+                throttle, admitted = self.admitted_times(throttle_class, throttle_class().duration / 240, windows=4)
+                for index, start in enumerate(admitted):
+                    in_window = [t for t in admitted[index:] if t < start + throttle.duration]
+                    self.assertLessEqual(len(in_window), throttle.num_requests)
+                # Clients asking all the time still get most of the rate.
+                self.assertGreaterEqual(len(admitted), 4 * throttle.num_requests // 2)
+
+    def test_half_the_rate_is_available_at_once(self):
+        throttle, admitted = self.admitted_times(AuthBurstThrottle, 0.001, windows=0.001)
+        self.assertEqual(len(admitted), 3)
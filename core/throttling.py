@@ -1,7 +1,46 @@
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 
+from core.rate_limit import get_rate_limit_store
 
-class AnonStrictThrottle(AnonRateThrottle):
+
+class GCRAThrottleMixin:
+    """
+    Replaces the request history kept in the cache by DRF's rate throttles with
+    GCRA state in the shared rate limit store (see core/rate_limit.py).
+    Limits hold across all worker processes and each check is O(1).
+
+    A bucket of `burst` requests refilled every `duration / (num_requests - burst + 1)` seconds admits
+    at most num_requests in any window of `duration`: the burst plus the refills that fall inside it.
+    Half the rate is available at once, the rest is spread over the window.
+    """
+    cost = 1
+
+    def get_burst(self):
+        return (self.num_requests + 1) // 2
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        burst = self.get_burst()
+        allowed, self.wait_seconds = get_rate_limit_store().acquire(
+            self.key,
+            emission_interval=self.duration / (self.num_requests - burst + 1),
+            burst=burst,
+            cost=self.cost,
+            now=self.timer(),
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonStrictThrottle(GCRAThrottleMixin, AnonRateThrottle):
     """
     Very tight limits for anonymous/unauthenticated requests.
     Prevents unauthenticated probing of the API.
@@ -10,7 +49,7 @@ class AnonStrictThrottle(AnonRateThrottle):
     rate = '10/minute'
 
 
-class AuthBurstThrottle(AnonRateThrottle):
+class AuthBurstThrottle(GCRAThrottleMixin, AnonRateThrottle):
     """
     Strict limits for authentication endpoints (login, register, token refresh).
     Prevents brute-force credential stuffing and enumeration attacks.
@@ -29,7 +68,7 @@ class AuthBurstThrottle(AnonRateThrottle):
         }
 
 
-class UserStandardThrottle(UserRateThrottle):
+class UserStandardThrottle(GCRAThrottleMixin, UserRateThrottle):
     """
     Moderate limits for general authenticated user activity.
     Covers list views, detail views, logout, and other standard operations.
@@ -38,7 +77,7 @@ class UserStandardThrottle(UserRateThrottle):
     rate = '100/minute'
 
 
-class AIGenerationThrottle(UserRateThrottle):
+class AIGenerationThrottle(GCRAThrottleMixin, UserRateThrottle):
     """
     Very strict limits for the AI quiz generation endpoint.
     This endpoint is extremely expensive:
@@ -1,13 +1,32 @@
 from django.contrib import admin
 
-from quizz_app.models import Quiz, Question
+from quizz_app.models import PipelineCheckpoint, Quiz, Question, QuizGenerationJob, TranscriptCacheEntry
 
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'description', 'owner', 'created_at')
+    list_display = ('id', 'title', 'description', 'owner', 'transcription_model', 'created_at')
+    list_filter = ('transcription_model',)
 
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ('id', 'quiz', 'question_title', 'answer')
 
+
+@admin.register(QuizGenerationJob)
+class QuizGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'video_url', 'status', 'stage', 'progress', 'quiz', 'created_at')
+    list_filter = ('status',)
+
+
+@admin.register(TranscriptCacheEntry)
+class TranscriptCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'video_key', 'transcription_model', 'size_bytes', 'transcription_seconds', 'hit_count', 'last_used_at')
+    search_fields = ('video_key',)
+
+
+@admin.register(PipelineCheckpoint)
+class PipelineCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('id', 'key', 'stage', 'created_at', 'expires_at')
+    list_filter = ('stage',)
+    search_fields = ('key',)
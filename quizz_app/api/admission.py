@@ -0,0 +1,210 @@
+import contextlib
+import math
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import APIException, Throttled
+
+from core.rate_limit import get_rate_limit_store
+from quizz_app.api.preflight import preflight_video
+from quizz_app.models import QuizGenerationJob
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Used for the Retry-After estimate until jobs have finished on this database.
+DEFAULT_JOB_SECONDS = 120
+
+
+class GenerationQueueFull(APIException):
+    status_code = 503
+    default_detail = 'Too many quizzes are being generated right now, please retry later.'
+    default_code = 'generation_queue_full'
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF sends `wait` as the Retry-After header.
+        self.wait = wait
+
+
+def queue_depth():
+    '''
+    Generation jobs waiting or running, over all worker processes.
+
+    Only jobs with a recent heartbeat count: rows orphaned by a restart stay pending or running
+    until jobs.fail_stale_jobs fails them, and must not fill the queue meanwhile.
+    '''
+    return QuizGenerationJob.objects.filter(
+        status__in=[QuizGenerationJob.Status.PENDING, QuizGenerationJob.Status.RUNNING],
+        updated_at__gte=timezone.now() - timedelta(seconds=settings.QUIZ_JOB_STALE_SECONDS),
+    ).count()
+
+
+def average_job_seconds(sample=20):
+    '''
+    Mean run time of the most recent successful jobs.
+    '''
+    runs = QuizGenerationJob.objects.filter(
+        status=QuizGenerationJob.Status.SUCCEEDED,
+        started_at__isnull=False,
+        finished_at__isnull=False,
+    ).order_by('-finished_at').values_list('started_at', 'finished_at')[:sample]
+    durations = [(finished - started).total_seconds() for started, finished in runs]
+    return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+
+def estimate_wait(depth):
+    '''
+    Seconds until a new job could start: the queue drained by TRANSCRIPTION_SLOTS parallel jobs.
+    '''
+    return math.ceil(depth * average_job_seconds() / settings.TRANSCRIPTION_SLOTS)
+
+
+def audio_minutes(duration_seconds):
+    return max(1, math.ceil(duration_seconds / 60))
+
+
+def charge_audio_minutes(user, duration_seconds):
+    '''
+    Take the audio minutes of a video from the user's budget (AUDIO_MINUTES_PER_DAY, refilled continuously).
+
+    :raises serializers.ValidationError: If the video alone exceeds the budget
+    :raises Throttled: If the budget is used up, with the time until enough minutes are back
+    '''
+    minutes = audio_minutes(duration_seconds)
+    budget = settings.AUDIO_MINUTES_PER_DAY
+    if minutes > budget:
+        raise serializers.ValidationError({
+            'url': f'The video is {minutes} minutes long, more than the daily budget of {budget} audio minutes.'
+        })
+    allowed, wait = get_rate_limit_store().acquire(
+        f'audio_minutes_{user.pk}',
+        emission_interval=24 * 60 * 60 / budget,
+        burst=budget,
+        cost=minutes,
+    )
+    if not allowed:
+        raise Throttled(wait=wait, detail=f'Your audio budget does not cover this {minutes} minute video yet.')
+
+
+def refund_audio_minutes(user, duration_seconds):
+    '''
+    Give back the minutes charged by charge_audio_minutes for a request that queued no job.
+    '''
+    get_rate_limit_store().refund(
+        f'audio_minutes_{user.pk}',
+        emission_interval=24 * 60 * 60 / settings.AUDIO_MINUTES_PER_DAY,
+        cost=audio_minutes(duration_seconds),
+    )
+
+
+def check_queue():
+    '''
+    Refuse with 503 while GENERATION_QUEUE_LIMIT jobs are pending or running.
+    '''
+    depth = queue_depth()
+    if depth >= settings.GENERATION_QUEUE_LIMIT:
+        raise GenerationQueueFull(wait=estimate_wait(depth))
+
+
+def admit_generation(user, video_url):
+    '''
+    Decide whether a generation request may be queued.
+
+    Refuses with 503 while GENERATION_QUEUE_LIMIT jobs are pending or running, then runs the
+    metadata preflight (which rejects playlists, live streams and overly long videos) and
+    charges the duration to the user's audio-minute budget.
+
+    Returns:
+        dict: Result of preflight_video, reused by the job for the download.
+    '''
+    check_queue()
+
+    preflight = preflight_video(video_url)
+    if not preflight['success']:
+        raise serializers.ValidationError({'url': preflight['error']})
+    if preflight['duration'] is None:
+        raise serializers.ValidationError({'url': 'The duration of this video is unknown.'})
+    charge_audio_minutes(user, preflight['duration'])
+    return preflight
+
+
+_thread_slots = None
+_thread_slots_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def transcription_slot(poll_seconds=0.5):
+    '''
+    Hold one of the TRANSCRIPTION_SLOTS transcription slots of the host, waiting until one is free.
+
+    Slots are lock files in TRANSCRIPTION_SLOTS_DIR held with flock, so the limit covers every
+    worker process and a crashed process releases its slot. Without fcntl (Windows) the limit
+    only applies within the process.
+
+    Yields:
+        int: Index of the slot.
+    '''
+    if fcntl is None:
+        global _thread_slots
+        with _thread_slots_lock:
+            if _thread_slots is None:
+                _thread_slots = threading.BoundedSemaphore(settings.TRANSCRIPTION_SLOTS)
+        with _thread_slots:
+            yield 0
+        return
+
+    os.makedirs(settings.TRANSCRIPTION_SLOTS_DIR, exist_ok=True)
+    while True:
+        for index in range(settings.TRANSCRIPTION_SLOTS):
+            slot_file = open(os.path.join(settings.TRANSCRIPTION_SLOTS_DIR, f'slot-{index}.lock'), 'a')
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            try:
+                yield index
+            finally:
+                fcntl.flock(slot_file, fcntl.LOCK_UN)
+                slot_file.close()
+            return
+        time.sleep(poll_seconds)
+
+
+def busy_transcription_slots():
+    '''
+    Number of slots currently held on the host (0 when slots are per process).
+    '''
+    if fcntl is None or not os.path.isdir(settings.TRANSCRIPTION_SLOTS_DIR):
+        return 0
+    busy = 0
+    for index in range(settings.TRANSCRIPTION_SLOTS):
+        with open(os.path.join(settings.TRANSCRIPTION_SLOTS_DIR, f'slot-{index}.lock'), 'a') as slot_file:
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                busy += 1
+            else:
+                fcntl.flock(slot_file, fcntl.LOCK_UN)
+    return busy
+
+
+def admission_stats():
+    depth = queue_depth()
+    return {
+        'queue_depth': depth,
+        'queue_limit': settings.GENERATION_QUEUE_LIMIT,
+        'transcription_slots': settings.TRANSCRIPTION_SLOTS,
+        'busy_transcription_slots': busy_transcription_slots(),
+        'average_job_seconds': round(average_job_seconds(), 1),
+        'estimated_wait_seconds': estimate_wait(depth),
+    }
@@ -0,0 +1,169 @@
+import numpy as np
+
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+# Raw 16-bit little-endian mono PCM at SAMPLE_RATE, the format Whisper decodes audio to.
+PCM_SUFFIX = '.s16le'
+PCM_BYTES_PER_SECOND = SAMPLE_RATE * 2
+
+
+def write_pcm(samples, path):
+    '''
+    Store float32 samples as 16-bit PCM (half the size of the float32 array).
+    '''
+    pcm = np.clip(samples, -1.0, 1.0) * 32767
+    pcm.astype('<i2').tofile(path)
+
+
+def read_pcm(path):
+    '''
+    Load a file written by write_pcm as float32 samples.
+    '''
+    return np.fromfile(path, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def frame_energy(samples, frame_length):
+    '''
+    Root mean square energy of consecutive, non-overlapping frames.
+
+    Args:
+        samples (numpy.ndarray): Mono float32 samples.
+        frame_length (int): Samples per frame. A trailing partial frame is ignored.
+
+    Returns:
+        numpy.ndarray: One energy value per frame.
+    '''
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    # einsum sums the squares frame by frame without a squared copy of the whole audio.
+    return np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame_length)
+
+
+def find_split_points(samples, segment_seconds, search_seconds=5.0, sample_rate=SAMPLE_RATE):
+    '''
+    Pick cut positions roughly every `segment_seconds`, each moved to the quietest
+    frame within `search_seconds` of the target so words are not cut in half.
+
+    Returns:
+        list[int]: Sample offsets of the cuts, in increasing order.
+    '''
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    energy = frame_energy(samples, frame_length)
+    frames_per_segment = int(segment_seconds / FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+
+    cuts = []
+    target = frames_per_segment
+    while target < len(energy) - search_frames:
+        low = max(target - search_frames, (cuts[-1] // frame_length + 1) if cuts else 1)
+        high = min(target + search_frames, len(energy))
+        quietest = low + int(np.argmin(energy[low:high]))
+        cuts.append(quietest * frame_length)
+        target = quietest + frames_per_segment
+    return cuts
+
+
+def split_at_silence(samples, segment_seconds, sample_rate=SAMPLE_RATE):
+    '''
+    Split audio into segments of about `segment_seconds`, cutting at quiet frames.
+
+    Returns:
+        list[numpy.ndarray]: Consecutive segments covering the whole input.
+    '''
+    return np.split(samples, find_split_points(samples, segment_seconds, sample_rate=sample_rate))
+
+
+def speech_mask(energy_db, enter_db, leave_db):
+    '''
+    Frame-wise speech decision with hysteresis: speech starts above `enter_db` and only ends
+    below `leave_db`. Frames in between keep the state of the last decided frame, which is
+    carried forward with a running maximum over frame indexes instead of a Python loop.
+
+    Returns:
+        numpy.ndarray: Boolean mask, True for speech frames.
+    '''
+    decided = (energy_db > enter_db) | (energy_db < leave_db)
+    last_decided = np.maximum.accumulate(np.where(decided, np.arange(len(energy_db)), -1))
+    return (last_decided >= 0) & (energy_db[np.maximum(last_decided, 0)] > enter_db)
+
+
+def frame_energy_db(samples, sample_rate=SAMPLE_RATE):
+    '''
+    Frame energy in dBFS (0 dB is a full-scale square wave).
+    '''
+    return 20 * np.log10(frame_energy(samples, int(FRAME_SECONDS * sample_rate)) + 1e-10)
+
+
+def is_silent(samples, floor_db=-55.0, sample_rate=SAMPLE_RATE):
+    '''
+    True when no frame of the audio is louder than `floor_db`.
+    '''
+    energy_db = frame_energy_db(samples, sample_rate)
+    return not (energy_db > floor_db).any()
+
+
+def trim_silence(
+    samples,
+    threshold_db=12.0,
+    min_silence_seconds=1.0,
+    keep_silence_seconds=0.3,
+    floor_db=-55.0,
+    min_contrast_db=6.0,
+    sample_rate=SAMPLE_RATE,
+):
+    '''
+    Drop the non-speech parts of audio before transcription.
+
+    Frames quieter than `floor_db` dBFS are always silence. Above that, frames louder than the
+    noise floor (10th percentile of the frame energy) by `threshold_db` are speech. When the noise
+    floor is within `min_contrast_db` of the median energy (a music bed, a steady tone, constant
+    background noise), the recording has no distinct pauses and only the absolute floor applies.
+    Pauses of at least `min_silence_seconds` are shortened to `keep_silence_seconds`, so Whisper
+    still hears a break between sentences; shorter pauses are kept as they are. If trimming would
+    keep less than a quarter of the audible (above `floor_db`) audio, the audio is returned unchanged.
+
+    Args:
+        samples (numpy.ndarray): Mono float32 samples.
+
+    Returns:
+        tuple: (trimmed samples, seconds removed)
+    '''
+    frame_length = int(FRAME_SECONDS * sample_rate)
+    energy_db = frame_energy_db(samples, sample_rate)
+    if len(energy_db) == 0:
+        return samples, 0.0
+    noise_floor_db = np.percentile(energy_db, 10)
+    if np.percentile(energy_db, 50) - noise_floor_db < min_contrast_db:
+        enter_db = leave_db = floor_db
+    else:
+        enter_db = max(noise_floor_db + threshold_db, floor_db)
+        leave_db = max(enter_db - threshold_db / 2, floor_db)
+    speech = speech_mask(energy_db, enter_db, leave_db)
+
+    # Run boundaries of the silent stretches, as frame indexes [start, end).
+    edges = np.diff(np.concatenate(([0], (~speech).astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    long_runs = (ends - starts) * FRAME_SECONDS >= min_silence_seconds
+    if not long_runs.any():
+        return samples, 0.0
+
+    keep_frames = int(keep_silence_seconds / FRAME_SECONDS) // 2
+    drop = np.zeros(len(energy_db) + 1, dtype=np.int32)
+    np.add.at(drop, starts[long_runs] + keep_frames, 1)
+    np.add.at(drop, ends[long_runs] - keep_frames, -1)
+    keep = np.cumsum(drop[:-1]) == 0
+
+    audible_frames = np.count_nonzero(energy_db > floor_db)
+    if np.count_nonzero(keep) < audible_frames / 4:
+        # Most of what can be heard would go: the speech decision is not trustworthy here.
+        return samples, 0.0
+
+    # The trailing partial frame is always kept.
+    keep_samples = np.ones(len(samples), dtype=bool)
+    keep_samples[:len(keep) * frame_length] = np.repeat(keep, frame_length)
+    trimmed = samples[keep_samples]
+    return trimmed, (len(samples) - len(trimmed)) / sample_rate
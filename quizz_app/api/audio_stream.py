@@ -0,0 +1,95 @@
+import subprocess
+
+import numpy as np
+
+from core.settings import YDL_AUDIO_OPTS
+from quizz_app.api.audio import SAMPLE_RATE
+from quizz_app.api.lazy import yt_dlp
+from quizz_app.api.preflight import preflight_video, preflight_ydl_opts, process_preflight
+
+
+BYTES_PER_SAMPLE = 2
+
+
+def resolve_audio_stream(url):
+    '''
+    Resolve the direct URL of the audio stream chosen by the preflight, without downloading it.
+
+    Args:
+        url (str): Video URL.
+
+    Returns:
+        dict: {'success': True, 'stream_url': '...', 'http_headers': {...}, 'title': '...', 'duration': seconds}
+            or {'success': False, 'error': '...'}
+    '''
+    if not url:
+        return {'success': False, 'error': 'The Video URl where not provided.'}
+    preflight = preflight_video(url)
+    if not preflight['success']:
+        return preflight
+    try:
+        with yt_dlp.YoutubeDL(preflight_ydl_opts(preflight, YDL_AUDIO_OPTS)) as ydl:
+            info_dict = process_preflight(preflight, ydl, download=False)
+        stream_url = info_dict.get('url')
+        if not stream_url:
+            return {'success': False, 'error': 'No audio stream found for the provided URL.'}
+        return {
+            'success': True,
+            'stream_url': stream_url,
+            'http_headers': info_dict.get('http_headers') or {},
+            'title': info_dict.get('title', 'Unknow Title'),
+            'duration': info_dict.get('duration') or preflight.get('duration'),
+        }
+    except Exception as e:
+        return {'success': False, 'error': f'Failed to resolve the audio stream: {str(e)}'}
+
+
+def iter_pcm_chunks(stream_url, http_headers=None, chunk_seconds=300):
+    '''
+    Decode an audio stream with a single ffmpeg process into 16 kHz mono float32 chunks.
+
+    Only one chunk is held in memory at a time, nothing is written to disk.
+
+    Args:
+        stream_url (str): Direct media URL (or local path) readable by ffmpeg.
+        http_headers (dict): Headers ffmpeg must send when fetching the URL.
+        chunk_seconds (int): Length of the yielded chunks in seconds.
+
+    Yields:
+        numpy.ndarray: float32 samples in [-1, 1].
+    '''
+    command = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+    if http_headers:
+        command += ['-headers', ''.join(f'{key}: {value}\r\n' for key, value in http_headers.items())]
+    command += ['-i', stream_url, '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-']
+
+    chunk_bytes = chunk_seconds * SAMPLE_RATE * BYTES_PER_SAMPLE
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            # A truncated stream can end on half a sample.
+            data = data[:len(data) - len(data) % BYTES_PER_SAMPLE]
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        if process.wait() != 0:
+            error = process.stderr.read().decode('utf-8', 'replace').strip()
+            raise RuntimeError(f'ffmpeg failed to decode the audio stream: {error}')
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def decode_audio(path):
+    '''
+    Decode a whole audio file into 16 kHz mono float32 samples, like whisper.load_audio
+    but without importing Whisper and torch into the process.
+    '''
+    chunks = list(iter_pcm_chunks(path))
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks)
@@ -0,0 +1,106 @@
+import html
+import re
+
+from django.conf import settings
+
+from core.settings import YDL_OPTS
+from quizz_app.api.lazy import yt_dlp
+from quizz_app.api.preflight import preflight_video
+
+
+TIMESTAMP_LINE = re.compile(r'^(\d{2}:)?\d{2}:\d{2}\.\d{3}\s+-->\s+')
+INLINE_TAG = re.compile(r'<[^>]*>')
+WHITESPACE = re.compile(r'\s+')
+
+
+def rolling_overlap(previous, cue):
+    '''
+    Number of leading lines of `cue` that repeat the last lines of the cue before it.
+    Rolling (auto-generated) captions show the previous line again at the top of every cue.
+    '''
+    for size in range(min(len(previous), len(cue)), 0, -1):
+        if previous[-size:] == cue[:size]:
+            return size
+    return 0
+
+
+def parse_vtt(vtt_text):
+    '''
+    Turn a WebVTT document into plain transcript text.
+
+    Drops the header, cue identifiers, timestamps, cue settings and inline timing tags.
+    Lines a cue repeats from the cue right before it (rolling captions) are removed;
+    a line said again later, after other cues, is kept.
+
+    Args:
+        vtt_text (str): WebVTT document.
+
+    Returns:
+        str: Transcript text.
+    '''
+    lines = []
+    previous = []
+    cue = None
+    for raw_line in vtt_text.splitlines() + ['']:
+        line = raw_line.strip()
+        if not line or TIMESTAMP_LINE.match(line):
+            if cue:
+                lines.extend(cue[rolling_overlap(previous, cue):])
+                previous = cue
+            # A timestamp opens a cue, a blank line closes it.
+            cue = [] if line else None
+            continue
+        if cue is None:
+            continue
+        line = WHITESPACE.sub(' ', html.unescape(INLINE_TAG.sub('', line))).strip()
+        if line:
+            cue.append(line)
+    return ' '.join(lines)
+
+
+def fetch_captions(url):
+    '''
+    Fetch the subtitles or automatic captions of a video without downloading any media.
+
+    The caption tracks are read from the preflight metadata (see preflight_video), which admission
+    already fetched, so the video is not extracted a second time. Uses settings.YDL_OPTS to select
+    the caption languages and the VTT format.
+
+    Args:
+        url (str): Video URL.
+
+    Returns:
+        dict: {'success': True, 'transcript': '...', 'title': '...', 'language': '...'}
+            or {'success': False, 'error': '...'}
+    '''
+    preflight = preflight_video(url)
+    if not preflight['success']:
+        return preflight
+    try:
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+            info_dict = preflight['info']
+            if info_dict is None:
+                # Metadata restored from a checkpoint carries no info dict.
+                info_dict = ydl.extract_info(preflight['url'], download=False, process=False)
+            subtitles = ydl.process_subtitles(
+                info_dict.get('id'),
+                info_dict.get('subtitles'),
+                info_dict.get('automatic_captions'),
+            ) or {}
+            for language, subtitle in subtitles.items():
+                if subtitle.get('ext') != 'vtt':
+                    continue
+                vtt_text = subtitle.get('data')
+                if vtt_text is None and subtitle.get('url'):
+                    vtt_text = ydl.urlopen(subtitle['url']).read().decode('utf-8', 'replace')
+                transcript = parse_vtt(vtt_text or '')
+                if len(transcript.split()) >= settings.CAPTIONS_MIN_WORDS:
+                    return {
+                        'success': True,
+                        'transcript': transcript,
+                        'title': info_dict.get('title', 'Unknow Title'),
+                        'language': language,
+                    }
+        return {'success': False, 'error': 'No usable captions found.'}
+    except Exception as e:
+        return {'success': False, 'error': f'Failed to fetch captions: {str(e)}'}
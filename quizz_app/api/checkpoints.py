@@ -0,0 +1,78 @@
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from quizz_app.api.scratch import release_scratch_dir
+from quizz_app.models import PipelineCheckpoint
+
+
+logger = logging.getLogger(__name__)
+
+Stage = PipelineCheckpoint.Stage
+
+
+def job_checkpoint_key(job_id):
+    return f'job:{job_id}'
+
+
+def load_checkpoint(key, stage):
+    '''
+    Data of an unexpired checkpoint, or None.
+    '''
+    if not key:
+        return None
+    return PipelineCheckpoint.objects.filter(
+        key=key,
+        stage=stage,
+        expires_at__gt=timezone.now(),
+    ).values_list('data', flat=True).first()
+
+
+def save_checkpoint(key, stage, data):
+    '''
+    Record the output of a stage for PIPELINE_CHECKPOINT_TTL_SECONDS, replacing an older one.
+    '''
+    if not key:
+        return
+    PipelineCheckpoint.objects.update_or_create(
+        key=key,
+        stage=stage,
+        defaults={
+            'data': data,
+            'expires_at': timezone.now() + timedelta(seconds=settings.PIPELINE_CHECKPOINT_TTL_SECONDS),
+        },
+    )
+    purge_expired_checkpoints()
+
+
+def clear_checkpoints(key, stages=None):
+    '''
+    Drop the checkpoints of a key (all stages by default) once they are no longer needed.
+    '''
+    if not key:
+        return
+    checkpoints = PipelineCheckpoint.objects.filter(key=key)
+    if stages is not None:
+        checkpoints = checkpoints.filter(stage__in=stages)
+    checkpoints.delete()
+
+
+def purge_expired_checkpoints():
+    '''
+    Delete expired checkpoints together with the audio they kept.
+    '''
+    expired = PipelineCheckpoint.objects.filter(expires_at__lte=timezone.now())
+    for data in expired.filter(stage=Stage.AUDIO).values_list('data', flat=True):
+        if data.get('scratch_dir'):
+            release_scratch_dir(data['scratch_dir'])
+            continue
+        file_path = data.get('file_path')
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                logger.warning('Could not remove the expired audio checkpoint %s: %s', file_path, e)
+    expired.delete()
@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from quizz_app.api.checkpoints import Stage, clear_checkpoints, job_checkpoint_key
+from quizz_app.api.serializers import save_generated_quiz
+from quizz_app.api.utils import generate_quiz_from_youtube
+from quizz_app.models import QuizGenerationJob
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Jobs queued or running on the pool of this process; their rows get a heartbeat.
+_live_jobs = set()
+_live_jobs_lock = threading.Lock()
+_monitor = None
+
+
+def get_executor():
+    '''
+    Return the process-wide pool running generation jobs, creating it on first use.
+    '''
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.QUIZ_JOB_WORKERS,
+                    thread_name_prefix='quiz-job',
+                )
+    start_monitor()
+    return _executor
+
+
+def submit_job(job_id):
+    with _live_jobs_lock:
+        _live_jobs.add(job_id)
+    get_executor().submit(run_generation_job, job_id)
+
+
+def enqueue_generation_job(job):
+    '''
+    Schedule a job on the worker pool once the transaction that created it commits.
+
+    Args:
+        job (QuizGenerationJob): The pending job.
+    '''
+    transaction.on_commit(lambda: submit_job(job.pk))
+
+
+def send_heartbeats():
+    '''
+    Touch the rows of the jobs queued or running in this process, so long stages
+    (downloads, transcriptions) are not mistaken for orphans by fail_stale_jobs.
+    '''
+    with _live_jobs_lock:
+        job_ids = list(_live_jobs)
+    if job_ids:
+        QuizGenerationJob.objects.filter(
+            pk__in=job_ids,
+            status__in=[QuizGenerationJob.Status.PENDING, QuizGenerationJob.Status.RUNNING],
+        ).update(updated_at=timezone.now())
+
+
+def is_stale(job):
+    '''
+    Whether a job is pending or running without a heartbeat for QUIZ_JOB_STALE_SECONDS (read only).
+    '''
+    return (
+        job.status in (QuizGenerationJob.Status.PENDING, QuizGenerationJob.Status.RUNNING)
+        and job.updated_at < timezone.now() - timedelta(seconds=settings.QUIZ_JOB_STALE_SECONDS)
+    )
+
+
+def fail_stale_jobs(pk=None):
+    '''
+    Mark pending and running jobs without a heartbeat for QUIZ_JOB_STALE_SECONDS as failed.
+
+    Jobs only live in the thread pool of the process that queued them, so a restart or a crash
+    leaves their rows pending or running forever. Failed, they can be retried (and resume from
+    their checkpoints) and no longer count towards the generation queue.
+
+    The heartbeat thread sweeps the whole table; views only pass the `pk` of a job that is_stale.
+
+    Returns:
+        int: Number of jobs marked as failed.
+    '''
+    now = timezone.now()
+    jobs = QuizGenerationJob.objects.filter(
+        status__in=[QuizGenerationJob.Status.PENDING, QuizGenerationJob.Status.RUNNING],
+        updated_at__lt=now - timedelta(seconds=settings.QUIZ_JOB_STALE_SECONDS),
+    )
+    if pk is not None:
+        jobs = jobs.filter(pk=pk)
+    failed = jobs.update(
+        status=QuizGenerationJob.Status.FAILED,
+        stage='failed',
+        error='The worker running this job stopped before it finished, please retry it.',
+        finished_at=now,
+        updated_at=now,
+    )
+    if failed:
+        logger.warning('Marked %d orphaned quiz generation job(s) as failed', failed)
+    return failed
+
+
+def run_monitor():
+    while True:
+        time.sleep(settings.QUIZ_JOB_HEARTBEAT_SECONDS)
+        try:
+            send_heartbeats()
+            fail_stale_jobs()
+        except Exception:
+            logger.exception('Quiz job heartbeat failed')
+        finally:
+            close_old_connections()
+
+
+def start_monitor():
+    '''
+    Start the heartbeat thread of this process once.
+    '''
+    global _monitor
+    with _live_jobs_lock:
+        if _monitor is None or not _monitor.is_alive():
+            _monitor = threading.Thread(target=run_monitor, name='quiz-job-heartbeat', daemon=True)
+            _monitor.start()
+
+
+def update_job(job_id, **fields):
+    '''
+    Update a job row without loading it (progress updates come from worker threads).
+    '''
+    fields['updated_at'] = timezone.now()
+    QuizGenerationJob.objects.filter(pk=job_id).update(**fields)
+
+
+def run_generation_job(job_id):
+    '''
+    Run the full generation pipeline for a job and store the resulting quiz.
+    Stage outputs are checkpointed under the job, so a retried job resumes where it failed.
+
+    Args:
+        job_id (int): Primary key of the QuizGenerationJob to run.
+    '''
+    run_key = job_checkpoint_key(job_id)
+    try:
+        job = QuizGenerationJob.objects.select_related('owner').get(pk=job_id)
+        update_job(job_id, status=QuizGenerationJob.Status.RUNNING, stage='starting', started_at=timezone.now())
+
+        def progress(stage, percent):
+            update_job(job_id, stage=stage, progress=percent)
+
+        preview_questions = []
+
+        def on_question(question):
+            # Streamed questions are shown on the job until the quiz is saved.
+            preview_questions.append(question)
+            update_job(job_id, preview_questions=preview_questions)
+
+        result = generate_quiz_from_youtube(job.video_url, progress=progress, on_question=on_question, run_key=run_key)
+        if not result['success']:
+            update_job(
+                job_id,
+                status=QuizGenerationJob.Status.FAILED,
+                stage='failed',
+                error=result.get('error', 'Unknown error'),
+                finished_at=timezone.now(),
+            )
+            return
+
+        progress('saving', 95)
+        quiz = save_generated_quiz(job.owner, job.video_url, result['quiz'], transcription_model=result['transcription_model'])
+        update_job(
+            job_id,
+            status=QuizGenerationJob.Status.SUCCEEDED,
+            transcript_source=result['transcript_source'],
+            metrics={
+                'transcript_cached': result['transcript_cached'],
+                'transcript_coalesced': result['transcript_coalesced'],
+                'transcription_model': result['transcription_model'],
+                'vad_removed_seconds': result['vad_removed_seconds'],
+                'llm_usage': result['usage'],
+                'resumed_from': result['resumed_from'],
+            },
+            stage='done',
+            progress=100,
+            quiz=quiz,
+            finished_at=timezone.now(),
+        )
+        clear_checkpoints(run_key)
+    except serializers.ValidationError as e:
+        # Retrying would only reproduce the same quiz, so the model has to answer again.
+        clear_checkpoints(run_key, [Stage.LLM_OUTPUT, Stage.QUIZ])
+        update_job(
+            job_id,
+            status=QuizGenerationJob.Status.FAILED,
+            stage='failed',
+            error=f'The generated quiz is invalid: {e.detail}',
+            finished_at=timezone.now(),
+        )
+    except Exception as e:
+        logger.exception('Quiz generation job %s crashed', job_id)
+        update_job(
+            job_id,
+            status=QuizGenerationJob.Status.FAILED,
+            stage='failed',
+            error=f'Failed to generate quiz: {str(e)}',
+            finished_at=timezone.now(),
+        )
+    finally:
+        with _live_jobs_lock:
+            _live_jobs.discard(job_id)
+        close_old_connections()
@@ -0,0 +1,56 @@
+import importlib
+import threading
+import time
+
+
+class LazyModule:
+    '''
+    Stand-in for a heavy module that is only imported on first attribute access.
+
+    Web workers import the pipeline modules (views -> jobs -> utils) but most of them
+    never run a generation, so Whisper (and torch with it), yt-dlp, google-genai and
+    tiktoken are loaded by the first job that needs them instead of at startup.
+    '''
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._import_seconds = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    self._import_seconds = time.perf_counter() - started
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
+
+
+whisper = LazyModule('whisper')
+yt_dlp = LazyModule('yt_dlp')
+yt_dlp_extractor = LazyModule('yt_dlp.extractor')
+genai = LazyModule('google.genai')
+genai_errors = LazyModule('google.genai.errors')
+genai_types = LazyModule('google.genai.types')
+tiktoken = LazyModule('tiktoken')
+
+LAZY_MODULES = [whisper, yt_dlp, yt_dlp_extractor, genai, genai_errors, genai_types, tiktoken]
+
+
+def lazy_module_stats():
+    '''
+    Import time (seconds) of every lazy module, None for the ones this process has not loaded.
+    '''
+    return {
+        module._name: None if module._import_seconds is None else round(module._import_seconds, 3)
+        for module in LAZY_MODULES
+    }
@@ -0,0 +1,272 @@
+import abc
+import asyncio
+import json
+import queue
+import re
+import threading
+import zlib
+
+import httpx
+from django.conf import settings
+from pydantic import BaseModel
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from quizz_app.api.lazy import genai, genai_errors, genai_types
+from quizz_app.api.transcript_chunks import count_tokens
+
+
+SYSTEM_INSTRUCTION = 'You are a helpful assistant that generates structured quizzes in JSON format.'
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class QuizQuestionSchema(BaseModel):
+    question_title: str
+    question_options: list[str]
+    answer: str
+
+
+class QuizSchema(BaseModel):
+    '''
+    Response schema requested from the model, so the output is valid quiz JSON by construction.
+    '''
+    title: str
+    description: str
+    questions: list[QuizQuestionSchema]
+
+
+class QuizLLMBackend(abc.ABC):
+    '''
+    Interface of the language model backends used to generate quizzes.
+
+    `generate` returns (response text, {'prompt_tokens': int, 'output_tokens': int}).
+    `stream` yields (text delta, usage or None) pairs; usage is set once known.
+    With `schema`, the model is asked for JSON following that pydantic model.
+    '''
+    @abc.abstractmethod
+    async def generate(self, prompt, system_instruction=SYSTEM_INSTRUCTION, schema=None):
+        ...
+
+    async def stream(self, prompt, system_instruction=SYSTEM_INSTRUCTION, schema=None):
+        text, usage = await self.generate(prompt, system_instruction, schema)
+        yield text, usage
+
+
+def is_transient_error(exc):
+    '''
+    Errors worth retrying: timeouts, connection problems, rate limits and server errors.
+    '''
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError))
+
+
+class GeminiBackend(QuizLLMBackend):
+    '''
+    Gemini through the async google-genai client.
+
+    One client (and its HTTP connection pool) is created per backend and used from
+    the backend event loop only, so connections are reused across calls.
+    '''
+    def __init__(self, api_key, model, timeout, max_attempts, base_url=None):
+        self.model = model
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=genai_types.HttpOptions(base_url=base_url, timeout=int(timeout * 1000)),
+        )
+
+    def get_config(self, system_instruction, schema):
+        if schema is None:
+            return genai_types.GenerateContentConfig(system_instruction=system_instruction)
+        return genai_types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            response_mime_type='application/json',
+            response_schema=schema,
+        )
+
+    def get_retrying(self):
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential_jitter(initial=1, max=20),
+            retry=retry_if_exception(is_transient_error),
+            reraise=True,
+        )
+
+    def get_usage(self, usage_metadata, prompt):
+        return {
+            'prompt_tokens': getattr(usage_metadata, 'prompt_token_count', None) or count_tokens(prompt),
+            'output_tokens': getattr(usage_metadata, 'candidates_token_count', None) or 0,
+        }
+
+    async def generate(self, prompt, system_instruction=SYSTEM_INSTRUCTION, schema=None):
+        async for attempt in self.get_retrying():
+            with attempt:
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=self.model,
+                        config=self.get_config(system_instruction, schema),
+                        contents=prompt,
+                    ),
+                    timeout=self.timeout,
+                )
+        return (response.text or '').strip(), self.get_usage(response.usage_metadata, prompt)
+
+    async def stream(self, prompt, system_instruction=SYSTEM_INSTRUCTION, schema=None):
+        # Only opening the stream is retried: once text was handed out a retry would duplicate it.
+        async for attempt in self.get_retrying():
+            with attempt:
+                response_stream = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(
+                        model=self.model,
+                        config=self.get_config(system_instruction, schema),
+                        contents=prompt,
+                    ),
+                    timeout=self.timeout,
+                )
+        async for response in response_stream:
+            usage = self.get_usage(response.usage_metadata, prompt) if response.usage_metadata else None
+            yield response.text or '', usage
+
+
+def build_fake_quiz(prompt):
+    '''
+    Deterministic quiz JSON for a prompt, built from the words of its transcript.
+    Used by FakeBackend and the fake_llm_server command.
+    '''
+    match = re.search(r'Create (\d+) multiple-choice questions', prompt)
+    question_count = int(match.group(1)) if match else 10
+    transcript = prompt.rsplit(':', 1)[-1]
+    words = re.findall(r'[A-Za-z]{4,}', transcript) or ['lorem', 'ipsum', 'dolor', 'amet']
+    digest = zlib.crc32(transcript.encode('utf-8'))
+    questions = []
+    for index in range(question_count):
+        options = [words[(index * 4 + offset) % len(words)] + f' {index}.{offset}' for offset in range(4)]
+        questions.append({
+            'question_title': f'Which term appears in statement {digest:x}-{index + 1}: {words[index % len(words)]}?',
+            'question_options': options,
+            'answer': options[index % 4],
+        })
+    return json.dumps({
+        'title': f'Quiz about {words[0]}',
+        'description': 'Generated by the fake LLM backend.',
+        'questions': questions,
+    })
+
+
+class FakeBackend(QuizLLMBackend):
+    '''
+    In-process stand-in for load tests and offline CI: answers every prompt with
+    a valid quiz after `latency` seconds (spread over the pieces when streaming).
+    '''
+    stream_pieces = 20
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def generate(self, prompt, system_instruction=SYSTEM_INSTRUCTION, schema=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = build_fake_quiz(prompt)
+        return text, {'prompt_tokens': count_tokens(prompt), 'output_tokens': count_tokens(text)}
+
+    async def stream(self, prompt, system_instruction=SYSTEM_INSTRUCTION, schema=None):
+        text = build_fake_quiz(prompt)
+        piece_length = -(-len(text) // self.stream_pieces)
+        for start in range(0, len(text), piece_length):
+            if self.latency:
+                await asyncio.sleep(self.latency / self.stream_pieces)
+            yield text[start:start + piece_length], None
+        yield '', {'prompt_tokens': count_tokens(prompt), 'output_tokens': count_tokens(text)}
+
+
+_backend = None
+_loop = None
+_lock = threading.Lock()
+
+
+def get_event_loop():
+    '''
+    Event loop running in a daemon thread, shared by all LLM calls of this process.
+    '''
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='llm-event-loop', daemon=True).start()
+        return _loop
+
+
+def run_async(coroutine):
+    '''
+    Run a coroutine on the shared LLM event loop and wait for its result (callable from any thread).
+    '''
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+
+def get_backend():
+    '''
+    The configured backend (settings.QUIZ_LLM_BACKEND), created on first use.
+    '''
+    global _backend
+    with _lock:
+        if _backend is None:
+            if settings.QUIZ_LLM_BACKEND == 'fake':
+                _backend = FakeBackend(latency=settings.QUIZ_LLM_FAKE_LATENCY)
+            elif settings.QUIZ_LLM_BACKEND == 'gemini':
+                _backend = GeminiBackend(
+                    api_key=settings.GEMINI_API_KEY,
+                    model=settings.GEMINI_MODEL,
+                    timeout=settings.GEMINI_TIMEOUT,
+                    max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+                    base_url=settings.GEMINI_BASE_URL,
+                )
+            else:
+                raise ValueError(f'Unknown QUIZ_LLM_BACKEND: {settings.QUIZ_LLM_BACKEND}')
+        return _backend
+
+
+async def generate_many(prompts, concurrency, schema=None):
+    '''
+    Run one generation per prompt with at most `concurrency` requests in flight.
+
+    Returns:
+        list: (text, usage) tuples, or the raised exception, in prompt order.
+    '''
+    backend = get_backend()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate_one(prompt):
+        async with semaphore:
+            return await backend.generate(prompt, schema=schema)
+
+    return await asyncio.gather(*(generate_one(prompt) for prompt in prompts), return_exceptions=True)
+
+
+def iter_stream(prompt, schema=None):
+    '''
+    Stream one generation on the shared LLM event loop and hand the pieces to the calling thread.
+
+    The consumer runs outside the event loop, so it may use the ORM.
+
+    Yields:
+        tuple: (text delta, usage or None)
+    '''
+    pieces = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for piece in get_backend().stream(prompt, schema=schema):
+                pieces.put(piece)
+        finally:
+            pieces.put(finished)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_event_loop())
+    while True:
+        piece = pieces.get()
+        if piece is finished:
+            break
+        yield piece
+    future.result()
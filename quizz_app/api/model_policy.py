@@ -0,0 +1,52 @@
+import logging
+
+from django.conf import settings
+
+from quizz_app.api.admission import queue_depth
+
+
+logger = logging.getLogger(__name__)
+
+# Whisper model sizes from the fastest to the most accurate.
+MODEL_SIZES = ('tiny', 'base', 'small', 'medium', 'large')
+
+
+def estimate_transcription_seconds(model_size, audio_seconds, waiting_jobs=0):
+    '''
+    Expected transcription time of audio with a model: its real-time factor, stretched
+    by the jobs that share the TRANSCRIPTION_SLOTS of the node with this one.
+    '''
+    factor = settings.WHISPER_REALTIME_FACTORS[model_size]
+    return audio_seconds * factor * (1 + waiting_jobs / settings.TRANSCRIPTION_SLOTS)
+
+
+def select_model_size(audio_seconds):
+    '''
+    Whisper model size for a job: the largest size up to WHISPER_MODEL_SIZE whose estimated
+    transcription time stays within WHISPER_LATENCY_TARGET_SECONDS, the smallest size otherwise.
+    Long videos and a busy node therefore get a faster model.
+
+    Args:
+        audio_seconds (float): Length of the audio, None when unknown.
+
+    Returns:
+        str: Model size.
+    '''
+    ceiling = settings.WHISPER_MODEL_SIZE
+    if not settings.WHISPER_ADAPTIVE_MODEL or not audio_seconds or ceiling not in MODEL_SIZES:
+        return ceiling
+
+    # The job asking is counted in the queue itself.
+    waiting_jobs = max(0, queue_depth() - 1)
+    candidates = [size for size in MODEL_SIZES[:MODEL_SIZES.index(ceiling) + 1] if size in settings.WHISPER_REALTIME_FACTORS]
+    if not candidates:
+        return ceiling
+    for model_size in reversed(candidates):
+        estimate = estimate_transcription_seconds(model_size, audio_seconds, waiting_jobs)
+        if estimate <= settings.WHISPER_LATENCY_TARGET_SECONDS:
+            break
+    logger.info(
+        'Selected Whisper model %s for %.0fs of audio with %d waiting job(s) (estimated %.0fs)',
+        model_size, audio_seconds, waiting_jobs, estimate,
+    )
+    return model_size
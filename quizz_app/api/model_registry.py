@@ -0,0 +1,123 @@
+import logging
+import mmap
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from quizz_app.api.lazy import whisper
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    '''
+    A Whisper model loaded once per process and shared between requests.
+
+    Whisper installs decoding hooks on the model while it transcribes, so
+    callers must hold `lock` for the duration of a `transcribe` call.
+    '''
+    def __init__(self, model, model_size, device, load_seconds):
+        self.model = model
+        self.model_size = model_size
+        self.device = device
+        self.load_seconds = load_seconds
+        self.lock = threading.Lock()
+
+    def transcribe(self, audio, **kwargs):
+        with self.lock:
+            return self.model.transcribe(audio, **kwargs)
+
+
+_models = {}
+_registry_lock = threading.Lock()
+
+
+def resident_memory_mb():
+    '''
+    Return the current resident set size of this process in MB, None without /proc (macOS, Windows).
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * mmap.PAGESIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_memory_mb():
+    '''
+    Return the peak resident set size of this process in MB, None without getrusage (Windows).
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def format_memory():
+    '''
+    Current RSS for log lines, the peak RSS where the current one cannot be read.
+    '''
+    current = resident_memory_mb()
+    if current is not None:
+        return f'RSS {current:.0f} MB'
+    peak = peak_memory_mb()
+    if peak is not None:
+        return f'peak RSS {peak:.0f} MB'
+    return 'RSS unknown'
+
+
+def get_whisper_model(model_size=None, device=None):
+    '''
+    Return the shared Whisper model for (model_size, device), loading it on first use.
+
+    Args:
+        model_size (str): Whisper model size ('tiny', 'base', 'small', 'medium', 'large').
+        device (str): Torch device ('cpu', 'cuda'). None lets Whisper decide.
+
+    Returns:
+        LoadedModel: The process-wide model entry.
+    '''
+    model_size = model_size or settings.WHISPER_MODEL_SIZE
+    device = device or settings.WHISPER_DEVICE
+    key = (model_size, device)
+
+    entry = _models.get(key)
+    if entry is not None:
+        return entry
+
+    with _registry_lock:
+        entry = _models.get(key)
+        if entry is None:
+            memory_before = format_memory()
+            started = time.perf_counter()
+            model = whisper.load_model(model_size, device=device)
+            load_seconds = time.perf_counter() - started
+            entry = LoadedModel(model, model_size, device, load_seconds)
+            _models[key] = entry
+            logger.info(
+                'Loaded Whisper model %s on %s in %.2fs (%s -> %s)',
+                model_size, device or 'default', load_seconds, memory_before, format_memory(),
+            )
+    return entry
+
+
+def warm_whisper_models():
+    '''
+    Preload the models listed in WHISPER_PRELOAD_MODELS so the first request does not pay for it.
+    '''
+    for model_size in settings.WHISPER_PRELOAD_MODELS:
+        try:
+            get_whisper_model(model_size)
+        except Exception:
+            logger.exception('Could not preload Whisper model %s', model_size)
+
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class QuizCursorPagination(CursorPagination):
+    '''
+    Keyset pagination over (created_at, id), newest first.
+    Page cost does not grow with the number of quizzes a user owns.
+    '''
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
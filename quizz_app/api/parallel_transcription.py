@@ -0,0 +1,100 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from quizz_app.api.audio import SAMPLE_RATE, split_at_silence
+from quizz_app.api.model_registry import get_whisper_model
+
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _init_worker(model_size, device, torch_threads):
+    '''
+    Runs once in every pool process: limit torch threads and preload the model.
+    '''
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    get_whisper_model(model_size, device)
+
+
+def _transcribe_segment(segment, model_size, device):
+    # Sizes other than the preloaded one are loaded on first use and kept by the worker.
+    result = get_whisper_model(model_size, device).transcribe(segment, fp16=False)
+    return result.get('text', '').strip()
+
+
+def get_pool(model_size, device, workers):
+    '''
+    Return the process pool for (device, workers), creating it on first use.
+
+    One pool serves every model size: jobs choose their size (see model_policy), and concurrent
+    jobs with different sizes share the workers, which load each size once. A pool is never
+    shut down while other threads may still be mapping on it.
+
+    Workers are spawned rather than forked because the parent runs job threads and may hold torch state.
+    '''
+    key = (device, workers)
+    with _pool_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = _pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_size, device, torch_threads),
+            )
+        return pool
+
+
+def reset_pool(pool):
+    '''
+    Drop a pool after one of its worker processes died; the next call creates a new one.
+    Threads still using the broken pool get BrokenProcessPool from it anyway.
+    '''
+    with _pool_lock:
+        for key, current in list(_pools.items()):
+            if current is pool:
+                del _pools[key]
+    pool.shutdown(wait=False)
+
+
+def transcribe_parallel(samples, model_size, device, workers, segment_seconds):
+    '''
+    Split audio at silences and transcribe the segments concurrently in a process pool.
+
+    Args:
+        samples (numpy.ndarray): 16 kHz mono float32 samples.
+        model_size (str): Whisper model size, loaded once per worker process.
+        device (str): Torch device or None.
+        workers (int): Number of worker processes.
+        segment_seconds (int): Target segment length.
+
+    Returns:
+        str: Transcript with the segments in their original order.
+    '''
+    started = time.perf_counter()
+    segments = split_at_silence(samples, segment_seconds)
+    pool = get_pool(model_size, device, workers)
+    count = len(segments)
+    try:
+        texts = list(pool.map(_transcribe_segment, segments, [model_size] * count, [device] * count))
+    except BrokenProcessPool:
+        reset_pool(pool)
+        raise
+    elapsed = time.perf_counter() - started
+    audio_seconds = len(samples) / SAMPLE_RATE
+    logger.info(
+        'Transcribed %.0fs of audio in %d segments with %d workers in %.1fs (%.1fx realtime)',
+        audio_seconds, count, workers, elapsed, audio_seconds / elapsed if elapsed else 0,
+    )
+    return ' '.join(text for text in texts if text)
@@ -0,0 +1,158 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+
+from quizz_app.api.checkpoints import Stage, load_checkpoint, save_checkpoint
+from quizz_app.api.lazy import yt_dlp
+from quizz_app.api.transcript_cache import canonical_video_key
+
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def audio_bitrate(video_format):
+    return video_format.get('abr') or video_format.get('tbr') or 0
+
+
+def select_audio_format(formats):
+    '''
+    Pick the smallest format that is still good enough for speech recognition.
+
+    Audio-only formats are preferred; among them the lowest bitrate of at least
+    AUDIO_MIN_BITRATE_KBPS wins (Whisper resamples to 16 kHz mono anyway).
+    If none reaches that bitrate the best audio-only format is used, and
+    formats with video (or unknown codecs) are only considered when there is no audio-only one.
+
+    Args:
+        formats (list[dict]): Formats of the yt-dlp info dict.
+
+    Returns:
+        dict | None: The chosen format, or None when no format has audio.
+    '''
+    with_audio = [
+        video_format for video_format in formats
+        if video_format.get('acodec') != 'none' and not video_format.get('has_drm')
+    ]
+    candidates = [video_format for video_format in with_audio if video_format.get('vcodec') == 'none'] or with_audio
+    if not candidates:
+        return None
+    adequate = [video_format for video_format in candidates if audio_bitrate(video_format) >= settings.AUDIO_MIN_BITRATE_KBPS]
+    if adequate:
+        return min(adequate, key=lambda video_format: (
+            audio_bitrate(video_format),
+            video_format.get('filesize') or video_format.get('filesize_approx') or 0,
+        ))
+    return max(candidates, key=audio_bitrate)
+
+
+def run_preflight(url):
+    try:
+        with yt_dlp.YoutubeDL({**settings.YDL_AUDIO_OPTS, 'skip_download': True}) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            # Short links and embeds point at the video page first.
+            for _ in range(3):
+                if info.get('_type') not in ('url', 'url_transparent'):
+                    break
+                info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    except Exception as e:
+        return {'success': False, 'error': f'Could not read the video information: {str(e)}'}
+
+    if info.get('_type') in ('playlist', 'multi_video'):
+        return {'success': False, 'error': 'Playlists are not supported, please provide the URL of a single video.'}
+    if info.get('is_live') or info.get('live_status') in ('is_live', 'is_upcoming'):
+        return {'success': False, 'error': 'Live streams and upcoming premieres are not supported.'}
+    duration = info.get('duration')
+    if duration and duration > settings.MAX_VIDEO_MINUTES * 60:
+        return {
+            'success': False,
+            'error': f'The video is {round(duration / 60)} minutes long, the limit is {settings.MAX_VIDEO_MINUTES} minutes.',
+        }
+    audio_format = select_audio_format(info.get('formats') or [])
+    if audio_format is None and info.get('formats'):
+        return {'success': False, 'error': 'The video has no downloadable audio.'}
+
+    return {
+        'success': True,
+        'url': url,
+        'title': info.get('title', 'Unknown'),
+        'duration': duration,
+        # None when the extractor lists no formats up front; yt-dlp then picks one while processing.
+        'format_id': audio_format['format_id'] if audio_format else None,
+        'info': info,
+    }
+
+
+def preflight_video(url):
+    '''
+    Read and check the metadata of a video before anything is downloaded.
+
+    The result is kept in memory for PREFLIGHT_TTL_SECONDS, so admission, the
+    download and the audio stream share one metadata request (see process_preflight).
+    The checks are also checkpointed per video; a retry in another process reuses them
+    and extracts the video only once, during the download ('info' is None then).
+
+    Args:
+        url (str): Video URL.
+
+    Returns:
+        dict: {'success': True, 'url': '...', 'title': '...', 'duration': seconds or None, 'format_id': '...', 'info': {...} or None}
+            or {'success': False, 'error': '...'} for playlists, live streams, videos longer than
+            MAX_VIDEO_MINUTES and videos without audio.
+    '''
+    key = canonical_video_key(url) or url
+    now = time.monotonic()
+    with _memo_lock:
+        cached = _memo.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    metadata = load_checkpoint(key, Stage.METADATA)
+    if metadata is not None:
+        return {'success': True, 'url': url, **metadata, 'info': None}
+
+    result = run_preflight(url)
+    if result['success']:
+        with _memo_lock:
+            for expired in [memo_key for memo_key, (expires, _) in _memo.items() if expires <= now]:
+                del _memo[expired]
+            _memo[key] = (now + settings.PREFLIGHT_TTL_SECONDS, result)
+        save_checkpoint(key, Stage.METADATA, {
+            'title': result['title'],
+            'duration': result['duration'],
+            'format_id': result['format_id'],
+        })
+    return result
+
+
+def preflight_ydl_opts(preflight, ydl_opts):
+    '''
+    YoutubeDL options selecting the preflight format, with concurrent fragment downloads.
+    '''
+    ydl_opts = {
+        **ydl_opts,
+        'concurrent_fragment_downloads': settings.YDL_CONCURRENT_FRAGMENTS,
+    }
+    if preflight['format_id']:
+        ydl_opts['format'] = f"{preflight['format_id']}/{ydl_opts.get('format', 'bestaudio/best')}"
+    return ydl_opts
+
+
+def process_preflight(preflight, ydl, download):
+    '''
+    Download the selected format (or only resolve its URL) from the preflight metadata, without extracting it again.
+
+    Args:
+        preflight (dict): Successful result of preflight_video.
+        ydl (yt_dlp.YoutubeDL): Instance created with preflight_ydl_opts.
+        download (bool): Download the media or only resolve it.
+
+    Returns:
+        dict: The processed info dict.
+    '''
+    if preflight['info'] is None:
+        return ydl.extract_info(preflight['url'], download=download)
+    # process_ie_result modifies the dict it is given, and the memoized one is shared.
+    return ydl.process_ie_result(copy.deepcopy(preflight['info']), download=download)
@@ -0,0 +1,72 @@
+import json
+
+
+class QuizStreamParser:
+    '''
+    Incremental parser for streamed quiz JSON.
+
+    Text is fed as it arrives; every object of the top-level "questions" array is
+    returned as soon as its closing brace has been received, long before the
+    whole document is complete.
+    '''
+    def __init__(self):
+        self.text = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.current_key = None
+        self.questions_depth = None
+        self.object_start = None
+
+    def feed(self, chunk):
+        '''
+        Add streamed text.
+
+        Args:
+            chunk (str): Next piece of the response.
+
+        Returns:
+            list[dict]: Questions completed by this chunk.
+        '''
+        self.text += chunk
+        completed = []
+        text = self.text
+        for index in range(self.position, len(text)):
+            char = text[index]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_string = text[self.string_start + 1:index]
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+            elif char == ':' and self.depth == 1:
+                self.current_key = self.last_string
+            elif char in '{[':
+                if char == '[' and self.depth == 1 and self.current_key == 'questions':
+                    self.questions_depth = self.depth + 1
+                elif char == '{' and self.questions_depth is not None and self.depth == self.questions_depth:
+                    self.object_start = index
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if char == ']' and self.questions_depth is not None and self.depth == self.questions_depth - 1:
+                    self.questions_depth = None
+                elif char == '}' and self.object_start is not None and self.depth == self.questions_depth:
+                    try:
+                        completed.append(json.loads(text[self.object_start:index + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self.object_start = None
+        self.position = len(text)
+        return completed
@@ -0,0 +1,97 @@
+from rest_framework import serializers
+
+from quizz_app.models import Question, Quiz
+
+
+QUIZ_FIELDS = ('id', 'owner', 'title', 'description', 'video_url', 'created_at', 'updated_at')
+QUESTION_FIELDS = ('id', 'question_title', 'question_options', 'answer', 'created_at', 'updated_at')
+
+# Same formatting as the DateTimeFields of the model serializers (ISO 8601, current time zone, 'Z' for UTC).
+_datetime_field = serializers.DateTimeField()
+
+
+def format_datetime(value):
+    return _datetime_field.to_representation(value) if value is not None else None
+
+
+def quiz_row_to_data(row):
+    '''
+    Build the QuizSerializer/QuizSummarySerializer representation from a `.values()` row.
+    '''
+    data = {
+        'id': row['id'],
+        'owner': row['owner'],
+        'title': row['title'],
+        'description': row['description'],
+        'video_url': row['video_url'],
+        'created_at': format_datetime(row['created_at']),
+        'updated_at': format_datetime(row['updated_at']),
+    }
+    if 'question_count' in row:
+        data['question_count'] = row['question_count']
+    return data
+
+
+def question_row_to_data(row):
+    '''
+    Build the QuestionSerializer representation from a `.values()` row.
+    '''
+    return {
+        'id': row['id'],
+        'question_title': row['question_title'],
+        'question_options': row['question_options'],
+        'answer': row['answer'],
+        'created_at': format_datetime(row['created_at']),
+        'updated_at': format_datetime(row['updated_at']),
+    }
+
+
+def questions_by_quiz(quiz_ids):
+    '''
+    Serialized questions of the given quizzes, fetched with a single query.
+
+    Returns:
+        dict: quiz id -> list of question dicts ordered by id.
+    '''
+    grouped = {quiz_id: [] for quiz_id in quiz_ids}
+    rows = Question.objects.filter(quiz_id__in=quiz_ids).order_by('quiz_id', 'id').values('quiz_id', *QUESTION_FIELDS)
+    for row in rows:
+        grouped[row['quiz_id']].append(question_row_to_data(row))
+    return grouped
+
+
+def serialize_quiz_rows(rows, include_questions):
+    '''
+    Representation of a page of quiz rows, with the nested questions when requested.
+
+    Args:
+        rows (list[dict]): Rows from `quiz_values()`.
+        include_questions (bool): Embed the questions (QuizSerializer shape).
+
+    Returns:
+        list[dict]: One dict per quiz.
+    '''
+    quizzes = [quiz_row_to_data(row) for row in rows]
+    if include_questions:
+        questions = questions_by_quiz([quiz['id'] for quiz in quizzes])
+        for quiz in quizzes:
+            quiz['questions'] = questions[quiz['id']]
+    return quizzes
+
+
+def quiz_values(queryset):
+    '''
+    Project a Quiz queryset onto the serialized fields (plus question_count when annotated).
+    '''
+    fields = QUIZ_FIELDS + (('question_count',) if 'question_count' in queryset.query.annotations else ())
+    return queryset.values(*fields)
+
+
+def get_quiz_data(pk):
+    '''
+    QuizDetailSerializer representation of one quiz, or None when it does not exist.
+    '''
+    row = quiz_values(Quiz.objects.filter(pk=pk)).first()
+    if row is None:
+        return None
+    return serialize_quiz_rows([row], include_questions=True)[0]
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_cache():
+    return caches['responses']
+
+
+def list_version_key(user_id):
+    return f'quizly:version:quiz-list:{user_id}'
+
+
+def quiz_version_key(quiz_id):
+    return f'quizly:version:quiz:{quiz_id}'
+
+
+def get_version(key):
+    '''
+    Current value of a version counter, created on first use: the time of its last bump in nanoseconds.
+    A counter that was evicted starts over with a new value, so old entries are never served again.
+    '''
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(keys):
+    '''
+    Invalidate every response cached under these version counters once the transaction commits.
+    '''
+    def bump():
+        get_cache().set_many({key: time.time_ns() for key in keys}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def cached_response(request, version_key, build):
+    '''
+    Serve a GET from the per-user response cache, answering conditional requests with 304.
+
+    Entries are keyed by user, request path and the current value of `version_key`,
+    so bumping the counter invalidates all of them at once.
+
+    Last-Modified is the time of the last bump, which every change of the data (including deletes and
+    question edits) goes through. HTTP dates have a resolution of one second, so it is only sent once
+    the bump is at least a second old: a later change then always gets a later date, and clients
+    that only send If-Modified-Since never get a 304 for data that changed.
+
+    Args:
+        request: DRF request of an authenticated user.
+        version_key (str): Version counter the response depends on.
+        build (callable): Returns the response data; may raise API exceptions, which are never cached.
+
+    Returns:
+        Response | HttpResponseNotModified
+    '''
+    cache = get_cache()
+    version = get_version(version_key)
+    path_digest = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    key = f'quizly:response:{request.user.pk}:{version_key}:{version}:{path_digest}'
+
+    entry = cache.get(key)
+    if entry is None:
+        _count('misses')
+        data = build()
+        last_modified = None
+        if time.time_ns() - version >= 1_000_000_000:
+            last_modified = version // 1_000_000_000
+        etag = hashlib.md5(f'{key}:{last_modified}'.encode('utf-8')).hexdigest()
+        entry = {'data': data, 'etag': quote_etag(etag), 'last_modified': last_modified}
+        cache.set(key, entry)
+    else:
+        _count('hits')
+
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+    if response is not None:
+        _count('not_modified')
+    else:
+        response = Response(entry['data'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def response_cache_stats():
+    '''
+    Hit/miss counters of this process.
+    '''
+    with _stats_lock:
+        process_stats = dict(_stats)
+    lookups = process_stats['hits'] + process_stats['misses']
+    return {
+        'process_hits': process_stats['hits'],
+        'process_misses': process_stats['misses'],
+        'process_not_modified': process_stats['not_modified'],
+        'process_hit_rate': round(process_stats['hits'] / lookups, 3) if lookups else None,
+    }
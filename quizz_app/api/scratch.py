@@ -0,0 +1,275 @@
+import contextlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# Reserved per second of audio: the downloaded source and the 192 kbps mp3 it is converted to,
+# later the mp3 and the trimmed 16-bit PCM handed to the transcription service.
+BYTES_PER_AUDIO_SECOND = 64_000
+# Reserved when the duration is unknown.
+DEFAULT_RESERVATION_BYTES = 64 * 1024 * 1024
+RESERVATION_FILE = '.reservation'
+
+_stats = {'allocated': 0, 'released': 0, 'swept': 0, 'swept_bytes': 0, 'quota_waits': 0, 'quota_rejections': 0, 'release_errors': 0}
+_stats_lock = threading.Lock()
+_thread_lock = threading.Lock()
+_sweeper = None
+
+
+class ScratchQuotaExceeded(Exception):
+    '''
+    The scratch space stayed above SCRATCH_QUOTA_BYTES for SCRATCH_QUOTA_WAIT_SECONDS.
+    '''
+
+
+def count(name, value=1):
+    with _stats_lock:
+        _stats[name] += value
+
+
+@contextlib.contextmanager
+def root_lock():
+    '''
+    Serialize quota decisions across the processes of the host (a flock'ed file in SCRATCH_ROOT).
+    '''
+    os.makedirs(settings.SCRATCH_ROOT, exist_ok=True)
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(settings.SCRATCH_ROOT, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def directory_size(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            if name == RESERVATION_FILE:
+                continue
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                # Removed while walking (e.g. a .part file renamed by yt-dlp).
+                continue
+    return total
+
+
+def read_reservation(path):
+    try:
+        with open(os.path.join(path, RESERVATION_FILE)) as reservation:
+            return int(reservation.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def iter_scratch_dirs():
+    try:
+        entries = list(os.scandir(settings.SCRATCH_ROOT))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield entry
+
+
+def scratch_usage():
+    '''
+    Bytes taken by the job directories: each counts its files or its reservation, whichever is larger.
+
+    Returns:
+        dict: {'directories': int, 'used_bytes': int, 'reserved_bytes': int, 'charged_bytes': int}
+    '''
+    usage = {'directories': 0, 'used_bytes': 0, 'reserved_bytes': 0, 'charged_bytes': 0}
+    for entry in iter_scratch_dirs():
+        used = directory_size(entry.path)
+        reserved = read_reservation(entry.path)
+        usage['directories'] += 1
+        usage['used_bytes'] += used
+        usage['reserved_bytes'] += reserved
+        usage['charged_bytes'] += max(used, reserved)
+    return usage
+
+
+def reservation_for(duration_seconds):
+    if not duration_seconds:
+        return DEFAULT_RESERVATION_BYTES
+    return int(duration_seconds * BYTES_PER_AUDIO_SECOND)
+
+
+def allocate_scratch_dir(label, duration_seconds=None, poll_seconds=1.0):
+    '''
+    Create an isolated directory for one job under SCRATCH_ROOT.
+
+    Space for the audio is reserved up front. While the reservations and files of all jobs would
+    exceed SCRATCH_QUOTA_BYTES, the call waits for other jobs to free space (backpressure).
+
+    Args:
+        label (str): Readable part of the directory name, e.g. the video key.
+        duration_seconds (float): Length of the audio to download, None when unknown.
+
+    Returns:
+        str: Path of the new directory.
+
+    Raises:
+        ScratchQuotaExceeded: If no space was freed within SCRATCH_QUOTA_WAIT_SECONDS.
+    '''
+    start_sweeper()
+    reserve_bytes = reservation_for(duration_seconds)
+    name = f"{re.sub(r'[^A-Za-z0-9_-]+', '_', label)[:64]}-{uuid.uuid4().hex[:12]}"
+    path = os.path.join(settings.SCRATCH_ROOT, name)
+    deadline = time.monotonic() + settings.SCRATCH_QUOTA_WAIT_SECONDS
+    waited = False
+    while True:
+        with root_lock():
+            charged = scratch_usage()['charged_bytes']
+            # A single job larger than the quota may still run alone.
+            if charged == 0 or charged + reserve_bytes <= settings.SCRATCH_QUOTA_BYTES:
+                os.makedirs(path)
+                with open(os.path.join(path, RESERVATION_FILE), 'w') as reservation:
+                    reservation.write(str(reserve_bytes))
+                count('allocated')
+                return path
+        if not waited:
+            waited = True
+            count('quota_waits')
+            logger.info('Scratch space is full (%d bytes charged), waiting to reserve %d bytes', charged, reserve_bytes)
+        if time.monotonic() >= deadline:
+            count('quota_rejections')
+            raise ScratchQuotaExceeded(
+                f'Not enough scratch space for the audio ({reserve_bytes // (1024 * 1024)} MB) right now, please retry later.'
+            )
+        time.sleep(poll_seconds)
+
+
+def settle_reservation(path, extra_bytes=0):
+    '''
+    Replace the up-front reservation of a directory once its download is complete: from then on
+    it is charged for its files plus `extra_bytes` still to be written, not for the estimate.
+    '''
+    with root_lock():
+        reserve_bytes = directory_size(path) + extra_bytes
+        with open(os.path.join(path, RESERVATION_FILE), 'w') as reservation:
+            reservation.write(str(reserve_bytes))
+    return reserve_bytes
+
+
+def release_scratch_dir(path):
+    '''
+    Delete a job directory with everything in it. Failures are logged, so leftovers show up
+    in the logs and are removed by the sweeper later.
+    '''
+    if not path:
+        return
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        count('release_errors')
+        logger.warning('Could not remove the scratch directory %s: %s', path, e)
+        return
+    count('released')
+
+
+def sweep_scratch(max_age_seconds=None):
+    '''
+    Remove job directories untouched for SCRATCH_MAX_AGE_SECONDS, left behind by crashed jobs
+    or by failed jobs that were never retried.
+
+    Returns:
+        int: Number of directories removed.
+    '''
+    max_age_seconds = settings.SCRATCH_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in iter_scratch_dirs():
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        size = directory_size(entry.path)
+        try:
+            shutil.rmtree(entry.path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning('Could not sweep the scratch directory %s: %s', entry.path, e)
+            continue
+        removed += 1
+        count('swept')
+        count('swept_bytes', size)
+    if removed:
+        logger.info('Swept %d stale scratch director(ies)', removed)
+    return removed
+
+
+def run_sweeper():
+    while True:
+        time.sleep(settings.SCRATCH_SWEEP_INTERVAL_SECONDS)
+        try:
+            sweep_scratch()
+        except Exception:
+            logger.exception('Scratch sweep failed')
+
+
+def start_sweeper():
+    '''
+    Start the sweeper thread of this process once.
+    '''
+    global _sweeper
+    with _thread_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(target=run_sweeper, name='scratch-sweeper', daemon=True)
+            _sweeper.start()
+
+
+def filesystem_type(path):
+    '''
+    Type of the filesystem holding `path` (e.g. 'tmpfs'), from /proc/mounts; None when unknown.
+    '''
+    path = os.path.realpath(path)
+    best, fs_type = '', None
+    try:
+        with open('/proc/mounts') as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1]
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return fs_type
+
+
+def scratch_stats():
+    with _stats_lock:
+        counters = {f'process_{name}': value for name, value in _stats.items()}
+    return {
+        'root': settings.SCRATCH_ROOT,
+        'filesystem': filesystem_type(settings.SCRATCH_ROOT),
+        'quota_bytes': settings.SCRATCH_QUOTA_BYTES,
+        **scratch_usage(),
+        **counters,
+    }
@@ -1,6 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
-from quizz_app.api.utils import generate_quiz_from_youtube
-from quizz_app.models import Quiz, Question
+from quizz_app.models import Quiz, Question, QuizGenerationJob
 
 class QuestionSerializer(serializers.ModelSerializer):
     '''
@@ -44,6 +44,18 @@ class QuizSerializer(serializers.ModelSerializer):
         model = Quiz
         fields = ['id', 'owner', 'title', 'description', 'video_url', 'created_at', 'updated_at', 'questions']
 
+class QuizSummarySerializer(serializers.ModelSerializer):
+    '''
+    Serializer for listing quizzes without their questions.
+    Expects the queryset to be annotated with question_count.
+    
+    '''
+    question_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Quiz
+        fields = ['id', 'owner', 'title', 'description', 'video_url', 'created_at', 'updated_at', 'question_count']
+
 class QuizDetailSerializer(serializers.ModelSerializer):
     '''
     Serializer for detailed view of a quiz.
@@ -86,41 +98,78 @@ class QuizAIGenerateCreateSerializer(serializers.Serializer):
         
     def create(self, validated_data):
         '''
-        Create a quiz by generating it from a YouTube video URL.
+        Create a generation job for a YouTube video URL.
+        The quiz itself is created by the job worker (see quizz_app.api.jobs).
         
         :param self: Descript the instance of the class
         :param validated_data: Describe the validated data from the serializer
-        :return: Created Quiz instance
+        :return: Created QuizGenerationJob instance
         '''
         request = self.context['request']
-        user = request.user
-        video_url = validated_data['url']
-        
-        result =generate_quiz_from_youtube(video_url) 
-        
-        if not result['success']:
-            raise serializers.ValidationError({'error': 'Failed to generate quiz: ' , 'details': result.get('error', 'Unknown error')})
-        
-        quiz_data = result['quiz']
-        
-        quiz = Quiz.objects.create(
-            owner=user,
-            title=quiz_data['title'],
-            description=quiz_data['description'],
-            video_url=video_url
+        return QuizGenerationJob.objects.create(
+            owner=request.user,
+            video_url=validated_data['url'],
+            idempotency_key=validated_data.get('idempotency_key'),
         )
-        for question_data in quiz_data.get('questions', []):
-            question = Question(
-                quiz=quiz,
-                question_title=question_data.get('question_title', ''),
-                question_options=question_data.get('question_options', []),
-                answer=question_data.get('answer', '')
-            )
-            question.save()
-        return quiz
-    
+
+
+class QuizGenerationJobSerializer(serializers.ModelSerializer):
+    '''
+    Serializer for the status of a quiz generation job.
+    '''
+    class Meta:
+        model = QuizGenerationJob
+        fields = ['id', 'video_url', 'status', 'stage', 'progress', 'transcript_source', 'metrics', 'preview_questions', 'quiz', 'error', 'created_at', 'updated_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+def valid_questions(questions):
+    '''
+    Keep the candidate questions that pass QuestionSerializer validation, so a malformed
+    candidate is dropped before selection instead of failing the whole quiz on save.
     
+    :param questions: Question dicts produced by the model
+    :return: The valid questions, in their original order
+    '''
+    return [
+        question for question in questions
+        if isinstance(question, dict) and QuestionSerializer(data=question).is_valid()
+    ]
+
+
+def save_generated_quiz(owner, video_url, quiz_data, quiz=None, transcription_model=''):
+    '''
+    Create (or fill) a Quiz and its questions from the quiz JSON produced by the pipeline.
+    All questions are validated with QuestionSerializer before anything is written, then
+    the quiz and its questions are written in one transaction with a single bulk INSERT.
     
-        
+    :param owner: User owning the quiz
+    :param video_url: Source video URL
+    :param quiz_data: Dict with title, description and questions
+    :param quiz: Existing Quiz to fill instead of creating one
+    :param transcription_model: Whisper model size the transcript was produced with, '' for captions
+    :return: The saved Quiz instance
+    :raises serializers.ValidationError: If any question is invalid; nothing is written then
+    '''
+    question_serializer = QuestionSerializer(data=quiz_data.get('questions', []), many=True)
+    question_serializer.is_valid(raise_exception=True)
 
-    
\ No newline at end of file
+    with transaction.atomic():
+        if quiz is None:
+            quiz = Quiz.objects.create(
+                owner=owner,
+                title=quiz_data.get('title', 'Generated Quiz'),
+                description=quiz_data.get('description', ''),
+                video_url=video_url,
+                transcription_model=transcription_model,
+            )
+        else:
+            quiz.title = quiz_data.get('title', 'Generated Quiz')
+            quiz.description = quiz_data.get('description', '')
+            quiz.transcription_model = transcription_model
+            quiz.save(update_fields=['title', 'description', 'transcription_model', 'updated_at'])
+        Question.objects.bulk_create([
+            Question(quiz=quiz, **question_data)
+            for question_data in question_serializer.validated_data
+        ])
+    return quiz
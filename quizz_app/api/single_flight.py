@@ -0,0 +1,81 @@
+import contextlib
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+_stats = {'leaders': 0, 'coalesced': 0}
+
+
+def single_flight(key, function):
+    '''
+    Run `function` once per key at a time within the process: threads asking for a key that is
+    already being computed wait for that call and get its result (or exception) instead.
+
+    Args:
+        key (str): Identity of the work, e.g. a canonical video key.
+        function (callable): Work to do when no call for the key is in flight.
+
+    Returns:
+        tuple: (result, coalesced) where coalesced is True when another thread did the work.
+    '''
+    with _calls_lock:
+        future = _calls.get(key)
+        leader = future is None
+        if leader:
+            future = _calls[key] = Future()
+            _stats['leaders'] += 1
+        else:
+            _stats['coalesced'] += 1
+    if not leader:
+        return future.result(), True
+
+    try:
+        result = function()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result, False
+    finally:
+        with _calls_lock:
+            del _calls[key]
+
+
+@contextlib.contextmanager
+def key_lock(key):
+    '''
+    Exclusive lock on a key across the processes of the host (a flock'ed file in SINGLE_FLIGHT_LOCK_DIR).
+    Without fcntl (Windows) this is a no-op and only the in-process single_flight applies.
+    '''
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(settings.SINGLE_FLIGHT_LOCK_DIR, exist_ok=True)
+    file_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock'
+    with open(os.path.join(settings.SINGLE_FLIGHT_LOCK_DIR, file_name), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def single_flight_stats():
+    with _calls_lock:
+        return {
+            'in_flight': len(_calls),
+            'process_leaders': _stats['leaders'],
+            'process_coalesced': _stats['coalesced'],
+        }
@@ -0,0 +1,155 @@
+import functools
+import logging
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from quizz_app.api.lazy import yt_dlp_extractor
+from quizz_app.models import TranscriptCacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that select a position in a playlist or video rather than the video itself.
+IGNORED_QUERY_PARAMS = {'list', 'index', 't', 'start', 'start_radio', 'pp', 'si', 'feature'}
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def strip_position_params(url):
+    '''
+    Drop playlist/timestamp/share parameters so URL variants of one video match the same extractor.
+    '''
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key not in IGNORED_QUERY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query), fragment=''))
+
+
+@functools.lru_cache(maxsize=1024)
+def canonical_video_key(url):
+    '''
+    Return '<extractor>:<video id>' as yt-dlp would extract it, without any network access.
+
+    Args:
+        url (str): Video URL in any of its variants (youtu.be, watch?v=...&t=30, playlist entries).
+
+    Returns:
+        str | None: The cache key, or None when the URL does not point at a single known video.
+    '''
+    if not url:
+        return None
+    url = strip_position_params(url.strip())
+    for extractor in yt_dlp_extractor.gen_extractor_classes():
+        if not extractor.suitable(url):
+            continue
+        if getattr(extractor, '_RETURN_TYPE', None) != 'video':
+            return None
+        video_id = extractor.get_temp_id(url)
+        if not video_id:
+            return None
+        return f'{extractor.ie_key()}:{video_id}'
+    return None
+
+
+def get_cached_transcript(video_key):
+    '''
+    Return the cache entry for a video key, or None on a miss.
+    '''
+    if not video_key:
+        return None
+    entry = TranscriptCacheEntry.objects.filter(video_key=video_key).only('pk', 'transcript', 'source', 'transcription_model').first()
+    if entry is None:
+        _count('misses')
+        return None
+    TranscriptCacheEntry.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=timezone.now(),
+    )
+    _count('hits')
+    return entry
+
+
+def store_transcript(video_key, transcript, transcription_seconds, source='', transcription_model=''):
+    '''
+    Cache a transcript and evict the least recently used entries above TRANSCRIPT_CACHE_MAX_BYTES.
+
+    Args:
+        video_key (str): Key returned by canonical_video_key.
+        transcript (str): Transcript text.
+        transcription_seconds (float): Time it took to produce the transcript.
+        source (str): Path that produced the transcript ('captions' or 'whisper').
+        transcription_model (str): Whisper model size used, '' for captions.
+    '''
+    if not video_key or not transcript:
+        return
+    size_bytes = len(transcript.encode('utf-8'))
+    if size_bytes > settings.TRANSCRIPT_CACHE_MAX_BYTES:
+        return
+    try:
+        TranscriptCacheEntry.objects.update_or_create(
+            video_key=video_key,
+            defaults={
+                'transcript': transcript,
+                'source': source,
+                'transcription_model': transcription_model,
+                'size_bytes': size_bytes,
+                'transcription_seconds': transcription_seconds,
+                'last_used_at': timezone.now(),
+            },
+        )
+    except IntegrityError:
+        # Another worker stored the same video at the same time.
+        return
+    evict_transcripts()
+
+
+def evict_transcripts():
+    '''
+    Delete least recently used entries until the cache fits in TRANSCRIPT_CACHE_MAX_BYTES.
+    '''
+    total = TranscriptCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    excess = total - settings.TRANSCRIPT_CACHE_MAX_BYTES
+    if excess <= 0:
+        return
+    evicted = []
+    for pk, size_bytes in TranscriptCacheEntry.objects.order_by('last_used_at').values_list('pk', 'size_bytes').iterator():
+        if excess <= 0:
+            break
+        evicted.append(pk)
+        excess -= size_bytes
+    TranscriptCacheEntry.objects.filter(pk__in=evicted).delete()
+    logger.info('Evicted %d transcripts from the cache', len(evicted))
+
+
+def transcript_cache_stats():
+    '''
+    Hit/miss counters of this process plus totals stored with the cache entries.
+    '''
+    totals = TranscriptCacheEntry.objects.aggregate(
+        total_bytes=Sum('size_bytes'),
+        total_hits=Sum('hit_count'),
+        seconds_saved=Sum(F('hit_count') * F('transcription_seconds')),
+    )
+    with _stats_lock:
+        process_stats = dict(_stats)
+    lookups = process_stats['hits'] + process_stats['misses']
+    return {
+        'entries': TranscriptCacheEntry.objects.count(),
+        'total_bytes': totals['total_bytes'] or 0,
+        'max_bytes': settings.TRANSCRIPT_CACHE_MAX_BYTES,
+        'hits': totals['total_hits'] or 0,
+        'transcription_seconds_saved': round(totals['seconds_saved'] or 0, 1),
+        'process_hits': process_stats['hits'],
+        'process_misses': process_stats['misses'],
+        'process_hit_rate': round(process_stats['hits'] / lookups, 3) if lookups else None,
+    }
@@ -0,0 +1,76 @@
+import functools
+import logging
+import re
+
+from django.conf import settings
+
+from quizz_app.api.lazy import tiktoken
+
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class ApproximateEncoding:
+    '''
+    Stand-in used when the tiktoken encoding cannot be loaded (it is downloaded on first use):
+    one token per 4 characters.
+    '''
+    chars_per_token = 4
+
+    def encode(self, text, disallowed_special=()):
+        return [text[i:i + self.chars_per_token] for i in range(0, len(text), self.chars_per_token)]
+
+    def decode(self, tokens):
+        return ''.join(tokens)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding():
+    try:
+        return tiktoken.get_encoding(settings.QUIZ_TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning('Could not load the %s encoding, estimating tokens: %s', settings.QUIZ_TOKEN_ENCODING, e)
+        return ApproximateEncoding()
+
+
+def count_tokens(text):
+    '''
+    Number of tokens of `text` in the QUIZ_TOKEN_ENCODING encoding.
+    '''
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def split_transcript(transcript_text, max_tokens):
+    '''
+    Split a transcript into consecutive chunks of at most `max_tokens` tokens.
+
+    Chunks end at sentence boundaries where possible; sentences longer than the
+    budget (e.g. unpunctuated captions) are cut on token boundaries.
+
+    Args:
+        transcript_text (str): Full transcript.
+        max_tokens (int): Token budget per chunk.
+
+    Returns:
+        list[str]: Chunks in transcript order.
+    '''
+    encoding = get_encoding()
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in SENTENCE_END.split(transcript_text.strip()):
+        tokens = encoding.encode(sentence + ' ', disallowed_special=())
+        if current and current_tokens + len(tokens) > max_tokens:
+            chunks.append(''.join(current).strip())
+            current, current_tokens = [], 0
+        if len(tokens) > max_tokens:
+            for start in range(0, len(tokens), max_tokens):
+                chunks.append(encoding.decode(tokens[start:start + max_tokens]).strip())
+            continue
+        current.append(sentence + ' ')
+        current_tokens += len(tokens)
+    if current:
+        chunks.append(''.join(current).strip())
+    return [chunk for chunk in chunks if chunk]
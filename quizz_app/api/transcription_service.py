@@ -0,0 +1,209 @@
+import collections
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+from quizz_app.api.audio import PCM_SUFFIX, SAMPLE_RATE, read_pcm
+from quizz_app.api.lazy import whisper
+from quizz_app.api.model_registry import get_whisper_model, peak_memory_mb, resident_memory_mb
+
+
+logger = logging.getLogger(__name__)
+
+# Recent jobs kept for the per-job timings of the stats.
+RECENT_JOBS = 20
+
+
+def get_authkey():
+    '''
+    Key both ends of the socket authenticate with (messages are pickled, so only trusted peers may connect).
+    '''
+    secret = settings.TRANSCRIPTION_SERVICE_AUTHKEY or settings.SECRET_KEY
+    return hashlib.sha256(f'quizly-transcription:{secret}'.encode('utf-8')).digest()
+
+
+def load_samples(audio):
+    '''
+    Samples of a request: decoded from an audio file, read from trimmed PCM (see audio.write_pcm),
+    or sent along as an array.
+    '''
+    if not isinstance(audio, str):
+        return audio
+    if audio.endswith(PCM_SUFFIX):
+        return read_pcm(audio)
+    return whisper.load_audio(audio)
+
+
+class TranscriptionServer:
+    '''
+    Long-lived process owning the Whisper models, so web and job workers do not load their own copies.
+
+    Every connection carries one request. Transcriptions are queued and run one at a time by a single
+    inference thread: Whisper's transcribe call has no batch API and a model is not thread safe, so a
+    FIFO queue in front of one model is the batching that fits.
+    '''
+    def __init__(self, address, model_size=None, device=None):
+        self.address = address
+        self.model_size = model_size or settings.WHISPER_MODEL_SIZE
+        self.device = device or settings.WHISPER_DEVICE
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.processed = 0
+        self.failed = 0
+        self.queue_seconds = 0.0
+        self.transcribe_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.recent_jobs = collections.deque(maxlen=RECENT_JOBS)
+        self.started_at = time.time()
+
+    def serve_forever(self):
+        get_whisper_model(self.model_size, self.device)
+        threading.Thread(target=self.run_inference, name='transcription-inference', daemon=True).start()
+
+        if os.path.exists(self.address):
+            # Left behind by a server that did not shut down cleanly.
+            os.remove(self.address)
+        with Listener(self.address, family='AF_UNIX', authkey=get_authkey()) as listener:
+            os.chmod(self.address, 0o600)
+            logger.info('Transcription service listening on %s', self.address)
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    logger.warning('Rejected a transcription service connection: %s', e)
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        with connection:
+            try:
+                request = connection.recv()
+            except (OSError, EOFError):
+                return
+            if request.get('op') == 'stats':
+                connection.send(self.stats())
+                return
+
+            job = {'request': request, 'enqueued_at': time.perf_counter(), 'done': threading.Event(), 'result': None}
+            self.jobs.put(job)
+            job['done'].wait()
+            try:
+                connection.send(job['result'])
+            except (OSError, EOFError):
+                logger.warning('Transcription client went away before its result was sent')
+
+    def run_inference(self):
+        while True:
+            job = self.jobs.get()
+            with self.lock:
+                self.in_progress += 1
+            started = time.perf_counter()
+            queue_seconds = started - job['enqueued_at']
+            request = job['request']
+            audio_seconds = 0.0
+            try:
+                samples = load_samples(request['audio'])
+                audio_seconds = len(samples) / SAMPLE_RATE
+                model = get_whisper_model(request.get('model_size') or self.model_size, self.device)
+                result = model.transcribe(samples, fp16=False, initial_prompt=request.get('initial_prompt'))
+                job['result'] = {'success': True, 'transcript': result.get('text', '').strip()}
+            except Exception as e:
+                logger.exception('Transcription service job failed')
+                job['result'] = {'success': False, 'error': f'Whisper transcription failed: {str(e)}'}
+            transcribe_seconds = time.perf_counter() - started
+            job['result'].update(queue_seconds=round(queue_seconds, 3), transcribe_seconds=round(transcribe_seconds, 3))
+
+            with self.lock:
+                self.in_progress -= 1
+                self.processed += 1
+                self.failed += not job['result']['success']
+                self.queue_seconds += queue_seconds
+                self.transcribe_seconds += transcribe_seconds
+                self.audio_seconds += audio_seconds
+                self.recent_jobs.append({
+                    'audio_seconds': round(audio_seconds, 1),
+                    'queue_seconds': round(queue_seconds, 3),
+                    'transcribe_seconds': round(transcribe_seconds, 3),
+                    'success': job['result']['success'],
+                })
+            job['done'].set()
+
+    def stats(self):
+        rss_mb = resident_memory_mb()
+        peak_rss_mb = peak_memory_mb()
+        with self.lock:
+            processed = self.processed or 1
+            return {
+                'model_size': self.model_size,
+                'device': self.device,
+                'rss_mb': round(rss_mb) if rss_mb is not None else None,
+                'peak_rss_mb': round(peak_rss_mb) if peak_rss_mb is not None else None,
+                'uptime_seconds': round(time.time() - self.started_at),
+                'queue_depth': self.jobs.qsize(),
+                'in_progress': self.in_progress,
+                'processed': self.processed,
+                'failed': self.failed,
+                'average_queue_seconds': round(self.queue_seconds / processed, 3),
+                'average_transcribe_seconds': round(self.transcribe_seconds / processed, 3),
+                'audio_seconds': round(self.audio_seconds, 1),
+                'recent_jobs': list(self.recent_jobs),
+            }
+
+
+def call_service(request, timeout):
+    '''
+    Send one request to the transcription service and wait up to `timeout` seconds for the answer.
+    '''
+    with Client(settings.TRANSCRIPTION_SERVICE_SOCKET, family='AF_UNIX', authkey=get_authkey()) as connection:
+        connection.send(request)
+        if not connection.poll(timeout):
+            raise TimeoutError(f'No answer from the transcription service within {timeout}s.')
+        return connection.recv()
+
+
+def transcribe_remote(audio, model_size=None, initial_prompt=None):
+    '''
+    Transcribe audio with the transcription service (see run_transcription_server).
+
+    Args:
+        audio (str | numpy.ndarray): Path to the audio file or to PCM written by audio.write_pcm,
+            or 16 kHz mono float32 samples (pickled over the socket, so prefer a path for long audio).
+        model_size (str): Whisper model size; the service default when None.
+        initial_prompt (str): Text preceding the audio, used to keep context across chunks.
+
+    Returns:
+        dict: {'success': True, 'transcript': '...', 'queue_seconds': .., 'transcribe_seconds': ..}
+            or {'success': False, 'error': '...'}
+    '''
+    if isinstance(audio, str):
+        # The service runs with its own working directory.
+        audio = os.path.abspath(audio)
+    request = {'audio': audio, 'model_size': model_size, 'initial_prompt': initial_prompt}
+    try:
+        result = call_service(request, settings.TRANSCRIPTION_SERVICE_TIMEOUT)
+    except (OSError, EOFError, AuthenticationError) as e:
+        return {'success': False, 'error': f'The transcription service is not available: {str(e)}'}
+    if result['success']:
+        logger.info(
+            'Transcription service: %.2fs queued, %.2fs transcribing',
+            result['queue_seconds'], result['transcribe_seconds'],
+        )
+    return result
+
+
+def transcription_service_stats():
+    if settings.TRANSCRIPTION_BACKEND != 'service':
+        return {'backend': settings.TRANSCRIPTION_BACKEND}
+    try:
+        stats = call_service({'op': 'stats'}, timeout=5)
+    except (OSError, EOFError, AuthenticationError) as e:
+        return {'backend': 'service', 'available': False, 'error': str(e)}
+    return {'backend': 'service', 'available': True, **stats}
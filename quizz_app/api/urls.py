@@ -1,8 +1,11 @@
 from django.urls import path
-from quizz_app.api.views import QuizGenerateAPIView, QuizListView, QuizRetrieveUpdateDeleteView
+from quizz_app.api.views import QuizGenerateAPIView, QuizGenerationJobView, QuizGenerationJobRetryView, QuizListView, PipelineStatsView, QuizRetrieveUpdateDeleteView
 
 urlpatterns = [
    path('createQuiz/', QuizGenerateAPIView.as_view(), name='quiz-create'),
    path('quizzes/', QuizListView.as_view(), name='quiz-list'),
    path('quizzes/<int:pk>/', QuizRetrieveUpdateDeleteView.as_view(), name='quiz-detail'),
+   path('jobs/<int:pk>/', QuizGenerationJobView.as_view(), name='quiz-job-detail'),
+   path('jobs/<int:pk>/retry/', QuizGenerationJobRetryView.as_view(), name='quiz-job-retry'),
+   path('stats/', PipelineStatsView.as_view(), name='pipeline-stats'),
 ]
\ No newline at end of file
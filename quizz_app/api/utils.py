@@ -1,40 +1,40 @@
+import hashlib
 import json
+import logging
 import os
-import whisper
-import yt_dlp
+import time
 from django.conf import settings
-from core.settings import  YDL_OPTS
-from google import genai
-from google.genai import types
-from quizz_app.models import Question
+from core.settings import YDL_AUDIO_OPTS
+from quizz_app.api.admission import transcription_slot
+from quizz_app.api.audio import PCM_BYTES_PER_SECOND, PCM_SUFFIX, SAMPLE_RATE, is_silent, trim_silence, write_pcm
+from quizz_app.api.audio_stream import decode_audio, iter_pcm_chunks, resolve_audio_stream
+from quizz_app.api.captions import fetch_captions
+from quizz_app.api.checkpoints import Stage, clear_checkpoints, load_checkpoint, save_checkpoint
+from quizz_app.api.lazy import whisper, yt_dlp
+from quizz_app.api.llm import QuizSchema, generate_many, iter_stream, run_async
+from quizz_app.api.model_policy import select_model_size
+from quizz_app.api.model_registry import get_whisper_model
+from quizz_app.api.parallel_transcription import transcribe_parallel
+from quizz_app.api.preflight import preflight_video, preflight_ydl_opts, process_preflight
+from quizz_app.api.quiz_stream import QuizStreamParser
+from quizz_app.api.scratch import ScratchQuotaExceeded, allocate_scratch_dir, release_scratch_dir, settle_reservation
+from quizz_app.api.serializers import save_generated_quiz, valid_questions
+from quizz_app.api.single_flight import key_lock, single_flight
+from quizz_app.api.transcription_service import transcribe_remote
+from quizz_app.api.transcript_cache import canonical_video_key, get_cached_transcript, store_transcript
+from quizz_app.api.transcript_chunks import count_tokens, split_transcript
 
 
-gemini_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+logger = logging.getLogger(__name__)
 
 
-def cleanup_media(file_path):
-    """
-    Remove the downloaded audio file, any sibling files (e.g. original .webm/.m4a),
-    and the parent quiz folder to free disk space.
-    """
-    try:
-        if file_path:
-            folder = os.path.dirname(file_path)
-            # Delete every file inside the quiz folder
-            if folder and os.path.isdir(folder):
-                for f in os.listdir(folder):
-                    os.remove(os.path.join(folder, f))
-                os.rmdir(folder)
-    except Exception:
-        pass
-
-
-def get_prompt(transcript_text):
+
+def get_prompt(transcript_text, question_count=10):
         prompt = f'''
         Create a quiz based on the following video transcript.
 
         Requirements:
-        - Create 10 multiple-choice questions.
+        - Create {question_count} multiple-choice questions.
         - Each question must have exactly 4 answer options.
         - Return the answer in the following JSON format:
 
@@ -54,7 +54,35 @@ def get_prompt(transcript_text):
         {transcript_text}
         '''
         return prompt
-    
+
+
+def get_chunk_prompt(transcript_text, part, parts, question_count):
+        prompt = f'''
+        Create quiz questions based on part {part} of {parts} of a video transcript.
+
+        Requirements:
+        - Create {question_count} multiple-choice questions about this part only.
+        - Each question must have exactly 4 answer options.
+        - The title and description describe the whole video as far as this part shows.
+        - Return the answer in the following JSON format:
+
+        {{
+        'title': 'Quiz Title',
+        'description': 'Brief description',
+        'questions': [
+            {{
+            'question_title': '...',
+            'question_options': ['...', '...', '...', '...'],
+            'answer': '...'
+            }}
+        ]
+        }}
+
+        Transcript part {part} of {parts}:
+        {transcript_text}
+        '''
+        return prompt
+
 def check_content_formatting(quiz_content):
     '''
     Check and correct the formatting of the generated quiz content.
@@ -70,6 +98,7 @@ def check_content_formatting(quiz_content):
         '''
         If the model mixes text with JSON → look for JSON part
         '''
+        logger.warning('Quiz output was not valid JSON, extracting the JSON part.')
         start = quiz_content.find('{')
         end = quiz_content.rfind('}') + 1
         if start != -1 and end != -1:
@@ -78,25 +107,30 @@ def check_content_formatting(quiz_content):
             raise ValueError('Gemini output was not valid JSON.')
         
         
-def download_audio_from_url(url, quiz_id):
+def download_audio_from_url(url, quiz_id=None):
+    '''
+    Download the audio of a video as mp3 into a scratch directory of its own (see scratch).
+    The caller removes the directory with release_scratch_dir once the audio is no longer needed.
+
+    Returns:
+        dict: {'success': True, 'file_path': '...', 'scratch_dir': '...', 'title': '...', 'duration': seconds}
+            or {'success': False, 'error': '...'}
+    '''
     if not url:
         return {'success': False, 'error': 'The Video URl where not provided.'}
 
-    outtmpl = f'media/quiz_{quiz_id}/%(id)s.%(ext)s'
+    preflight = preflight_video(url)
+    if not preflight['success']:
+        return preflight
+
+    label = f'quiz_{quiz_id}' if quiz_id is not None else canonical_video_key(url) or 'audio'
+    try:
+        scratch_dir = allocate_scratch_dir(label, preflight.get('duration'))
+    except ScratchQuotaExceeded as e:
+        return {'success': False, 'error': str(e)}
     ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': outtmpl,
-        'quiet': True,
-        'noplaylist': True,
-        'extractor_args': {
-            'youtube': {
-                'player_client': ['android'],
-                'player_skip': ['webpage', 'configs', 'js'],
-            }
-        },
-        'headers': {
-            'User-Agent': 'Mozilla/5.0 (Linux; Android 10; SM-G981B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36',
-        },
+        **YDL_AUDIO_OPTS,
+        'outtmpl': os.path.join(scratch_dir, '%(id)s.%(ext)s'),
         'postprocessors': [{
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
@@ -104,36 +138,72 @@ def download_audio_from_url(url, quiz_id):
         }],
     }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=True)
+        with yt_dlp.YoutubeDL(preflight_ydl_opts(preflight, ydl_opts)) as ydl:
+            info_dict = process_preflight(preflight, ydl, download=True)
             audio_file_path = ydl.prepare_filename(info_dict)
             base, _ = os.path.splitext(audio_file_path)
             mp3_path = base + '.mp3'
             if os.path.exists(mp3_path):
                 audio_file_path = mp3_path
-        return {'success': True, 'file_path': audio_file_path, 'title': info_dict.get('title', 'Unknow Title')}
+        duration = info_dict.get('duration') or preflight.get('duration')
+        # The trimmed PCM for the transcription service is still to come.
+        pcm_bytes = 0
+        if settings.VAD_TRIM and settings.TRANSCRIPTION_BACKEND == 'service':
+            pcm_bytes = int((duration or 0) * PCM_BYTES_PER_SECOND)
+        settle_reservation(scratch_dir, pcm_bytes)
+        return {
+            'success': True,
+            'file_path': audio_file_path,
+            'scratch_dir': scratch_dir,
+            'title': info_dict.get('title', 'Unknow Title'),
+            'duration': duration,
+        }
     except Exception as e:
+        release_scratch_dir(scratch_dir)
         return {'success': False, 'error': f'Failed to download audio from the provided URL: {str(e)}'}
 
 
 
-def transcription_with_whisper(audio_file_path) :
+def transcription_with_whisper(audio, model_size=None, initial_prompt=None) :
     '''
-    Transcribe an audio file using OpenAI Whisper.
+    Transcribe audio using OpenAI Whisper.
+    The model is loaded once per process and shared (see model_registry), or held by
+    the transcription service with TRANSCRIPTION_BACKEND=service (see transcription_service).
+    With WHISPER_PARALLEL_WORKERS > 1, long audio is split at silences and
+    transcribed in a process pool (see parallel_transcription).
 
     Args:
-        audio_file_path (str): Path to the audio file.
+        audio (str | numpy.ndarray): Path to the audio file, or 16 kHz mono float32 samples.
         model_size (str): Whisper model size ('tiny', 'base', 'small', 'medium', 'large').
+            Defaults to settings.WHISPER_MODEL_SIZE.
+        initial_prompt (str): Text preceding the audio, used to keep context across chunks.
 
     Returns:
         dict: {'success': True, 'transcript': '...'} or {'success': False, 'error': '...'}
     '''
-    if not os.path.exists(audio_file_path):
+    if isinstance(audio, str) and not os.path.exists(audio):
         return {'success': False, 'error': 'Audio file does not exist.'}
 
+    if settings.TRANSCRIPTION_BACKEND == 'service':
+        return transcribe_remote(audio, model_size, initial_prompt)
+
     try:
-        model = whisper.load_model('small')
-        result = model.transcribe(audio_file_path, fp16=False)
+        workers = settings.WHISPER_PARALLEL_WORKERS
+        if workers > 1:
+            samples = whisper.load_audio(audio) if isinstance(audio, str) else audio
+            if len(samples) > 2 * settings.WHISPER_SEGMENT_SECONDS * SAMPLE_RATE:
+                transcript_text = transcribe_parallel(
+                    samples,
+                    model_size or settings.WHISPER_MODEL_SIZE,
+                    settings.WHISPER_DEVICE,
+                    workers,
+                    settings.WHISPER_SEGMENT_SECONDS,
+                )
+                return {'success': True, 'transcript': transcript_text}
+            audio = samples
+
+        model = get_whisper_model(model_size)
+        result = model.transcribe(audio, fp16=False, initial_prompt=initial_prompt)
 
         transcript_text = result.get('text', '').strip()
 
@@ -142,35 +212,324 @@ def transcription_with_whisper(audio_file_path) :
     except Exception as e:
         return {'success': False, 'error': f'Whisper transcription failed: {str(e)}'}
 
-def generate_quizes_using_genmini_ai(transcript_text):
+
+def remove_silence(samples):
+    '''
+    Shorten the pauses of audio with voice-activity trimming (see audio.trim_silence), unless VAD_TRIM is off.
+
+    Returns:
+        tuple: (samples, seconds removed)
+    '''
+    if not settings.VAD_TRIM:
+        return samples, 0.0
+    return trim_silence(
+        samples,
+        settings.VAD_THRESHOLD_DB,
+        settings.VAD_MIN_SILENCE_SECONDS,
+        settings.VAD_KEEP_SILENCE_SECONDS,
+        settings.VAD_FLOOR_DB,
+        settings.VAD_MIN_CONTRAST_DB,
+    )
+
+
+def load_speech(audio_path, duration=None):
+    '''
+    Load an audio file as 16 kHz samples with its pauses shortened. With VAD_TRIM off, the path is
+    returned unchanged and Whisper loads the file itself.
+
+    The file is decoded with ffmpeg directly (see audio_stream.decode_audio), so Whisper and torch are
+    not loaded into web workers. With TRANSCRIPTION_BACKEND=service, the trimmed audio is written as
+    16-bit PCM next to the file and its path is returned, so the samples are not pickled over the
+    service socket.
+
+    Args:
+        audio_path (str): Path to the downloaded audio, inside the scratch directory of the job.
+        duration (float): Length of the audio, None when unknown.
+
+    Returns:
+        dict: {'success': True, 'audio': samples or path, 'removed_seconds': float, 'duration': seconds}
+            or {'success': False, 'error': '...'}
     '''
-    Generate a quiz based on a video transcript using Gemini.
+    if not settings.VAD_TRIM:
+        return {'success': True, 'audio': audio_path, 'removed_seconds': 0.0, 'duration': duration}
+    try:
+        samples, removed_seconds = remove_silence(decode_audio(audio_path))
+        audio = samples
+        if settings.TRANSCRIPTION_BACKEND == 'service':
+            audio = os.path.splitext(audio_path)[0] + PCM_SUFFIX
+            write_pcm(samples, audio)
+    except Exception as e:
+        return {'success': False, 'error': f'Failed to load the audio: {str(e)}'}
+    logger.info('Voice-activity trimming removed %.0fs of %s', removed_seconds, audio_path)
+    return {'success': True, 'audio': audio, 'removed_seconds': removed_seconds, 'duration': len(samples) / SAMPLE_RATE}
+
+
+def transcribe_audio_stream(video_url):
+    '''
+    Transcribe a video by decoding its audio stream to PCM chunks in memory.
+    Avoids the mp3 re-encode and the disk round-trip of download_audio_from_url.
+
+    Args:
+        video_url (str): Video URL.
+
+    Returns:
+        dict: {'success': True, 'transcript': '...', 'title': '...', 'model': '...', 'vad_removed_seconds': float}
+            or {'success': False, 'error': '...'}
+    '''
+    stream = resolve_audio_stream(video_url)
+    if not stream['success']:
+        return stream
+
+    model_size = select_model_size(stream['duration'])
+    texts = []
+    removed_seconds = 0.0
+    try:
+        for chunk in iter_pcm_chunks(stream['stream_url'], stream['http_headers'], settings.AUDIO_STREAM_CHUNK_SECONDS):
+            chunk, chunk_removed = remove_silence(chunk)
+            removed_seconds += chunk_removed
+            if chunk_removed and is_silent(chunk, settings.VAD_FLOOR_DB):
+                # Nothing above the silence floor is left in this chunk.
+                continue
+            previous_text = texts[-1][-200:] if texts else None
+            chunk_res = transcription_with_whisper(chunk, model_size, initial_prompt=previous_text)
+            if not chunk_res['success']:
+                return chunk_res
+            if chunk_res['transcript']:
+                texts.append(chunk_res['transcript'])
+    except Exception as e:
+        return {'success': False, 'error': f'Failed to stream audio from the provided URL: {str(e)}'}
+    return {
+        'success': True,
+        'transcript': ' '.join(texts),
+        'title': stream['title'],
+        'model': model_size,
+        'vad_removed_seconds': removed_seconds,
+    }
+
+def chunk_questions(result, prompt):
+    '''
+    Map step result for one transcript chunk. A failed chunk yields None instead of
+    raising, so one bad chunk does not sink the whole quiz.
+    '''
+    if isinstance(result, Exception):
+        logger.warning('Quiz generation for a transcript chunk failed: %s', result)
+        return None, {'prompt_tokens': count_tokens(prompt), 'output_tokens': 0}
+    quiz_content, usage = result
+    try:
+        return check_content_formatting(quiz_content), usage
+    except ValueError as e:
+        logger.warning('Could not parse the quiz of a transcript chunk: %s', e)
+        return None, usage
+
+
+def stream_quiz(prompt, on_question=None):
+    '''
+    Generate a quiz with a streamed, schema-constrained response.
+
+    Questions are parsed as soon as each one is complete and handed to `on_question`.
+
+    Returns:
+        tuple: (raw model output, usage)
+    '''
+    parser = QuizStreamParser()
+    pieces = []
+    usage = None
+    for text, piece_usage in iter_stream(prompt, schema=QuizSchema):
+        pieces.append(text)
+        usage = piece_usage or usage
+        for question in parser.feed(text):
+            if on_question is not None:
+                on_question(question)
+
+    quiz_content = ''.join(pieces).strip()
+    usage = usage or {'prompt_tokens': count_tokens(prompt), 'output_tokens': count_tokens(quiz_content)}
+    return quiz_content, usage
+
+
+def parse_quiz_output(quiz_content):
+    '''
+    Parse the quiz JSON of the model. The repairing check_content_formatting only runs when
+    it is not valid JSON; if the document stays broken, the complete questions found in it are kept.
+    '''
+    try:
+        return check_content_formatting(quiz_content)
+    except ValueError:
+        questions = QuizStreamParser().feed(quiz_content)
+        if not questions:
+            raise
+        return {'title': 'Generated Quiz', 'description': '', 'questions': questions}
+
+
+def prompt_key(prompt):
+    '''
+    Checkpoint key of the model output for a prompt, so outputs stay matched to their transcript chunk.
+    '''
+    return hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+
+
+def drop_invalid_questions(question_lists):
+    '''
+    Remove the questions QuestionSerializer would reject (see serializers.valid_questions),
+    so one malformed question does not fail the whole quiz when it is saved.
+
+    Args:
+        question_lists (list[list[dict]]): Questions per model response.
+
+    Returns:
+        list[list[dict]]: The valid questions per response, in their original order.
+    '''
+    valid_lists = [valid_questions(questions) for questions in question_lists]
+    dropped = sum(map(len, question_lists)) - sum(map(len, valid_lists))
+    if dropped:
+        logger.warning('Dropped %d invalid question(s)', dropped)
+    return valid_lists
+
+
+def select_questions(question_lists, question_count):
+    '''
+    Reduce step: pick `question_count` questions spread evenly over the chunks.
+
+    Every chunk gets an equal share of the questions; shares a chunk cannot fill
+    (failed call, duplicates) are filled from the remaining candidates of the other chunks.
+    Questions are returned in video order.
+
+    Args:
+        question_lists (list[list[dict]]): Candidate questions per chunk, in transcript order.
+        question_count (int): Number of questions to return.
+    '''
+    chunk_count = len(question_lists)
+    quotas = [question_count * (i + 1) // chunk_count - question_count * i // chunk_count for i in range(chunk_count)]
+    seen = set()
+    selected = []
+    leftovers = []
+    for chunk_index, questions in enumerate(question_lists):
+        taken = 0
+        for rank, question in enumerate(questions):
+            key = ' '.join(str(question.get('question_title', '')).lower().split())
+            if not key or key in seen:
+                continue
+            if taken < quotas[chunk_index]:
+                seen.add(key)
+                selected.append((chunk_index, rank, question))
+                taken += 1
+            else:
+                leftovers.append((rank, chunk_index, key, question))
+    for rank, chunk_index, key, question in sorted(leftovers, key=lambda item: (item[0], item[1])):
+        if len(selected) >= question_count:
+            break
+        if key not in seen:
+            seen.add(key)
+            selected.append((chunk_index, rank, question))
+    selected.sort(key=lambda item: (item[0], item[1]))
+    return [question for _, _, question in selected[:question_count]]
+
+
+def generate_quizes_using_genmini_ai(transcript_text, on_question=None, run_key=None):
+    '''
+    Generate a quiz based on a video transcript using the configured LLM backend (see llm.py).
+
+    Transcripts that fit in QUIZ_CHUNK_TOKENS are sent in one streamed call and
+    `on_question` receives every question as soon as it is complete. Longer ones are
+    split into token-budgeted chunks; candidate questions are generated per chunk
+    concurrently (at most QUIZ_LLM_CONCURRENCY calls at a time) and reduced to
+    QUIZ_QUESTION_COUNT questions spread over the whole video.
+
+    With `run_key`, the raw model output (per prompt) and the parsed quiz are checkpointed:
+    a retried run returns the parsed quiz directly, or only sends the prompts that have
+    no output yet to the model.
 
     Args:
         transcript (str): Video transcript text.
-        model (str): Gemini model to use.
+        on_question (callable): Optional callback(question dict) for streamed questions.
+        run_key (str): Checkpoint key of the run (see checkpoints.job_checkpoint_key).
 
     Returns:
-        dict: {'success': True, 'quiz': {...}} or {'success': False, 'error': '...'}
+        dict: {'success': True, 'quiz_content': {...}, 'usage': {...}, 'resumed_from': stage or None}
+            or {'success': False, 'error': '...'}
     '''
     
     if not transcript_text:
         return {'success': False, 'error': 'Transcript text is empty.', 'questions': []}
-    
+
+    checkpoint = load_checkpoint(run_key, Stage.QUIZ)
+    if checkpoint is not None:
+        return {'success': True, 'quiz_content': checkpoint['quiz'], 'usage': checkpoint['usage'], 'resumed_from': Stage.QUIZ}
+
     try:
-        safe_transcript = transcript_text[:12000].replace('\0', '')
-        safe_transcript = safe_transcript.replace('{', '{{').replace('}', '}}')
-        response = gemini_client.models.generate_content(
-            model='gemini-2.5-flash',
-            config = types.GenerateContentConfig(
-                system_instruction='You are a helpful assistant that generates structured quizzes in JSON format.'),
-            contents =  get_prompt(safe_transcript)
+        safe_transcript = transcript_text.replace('\0', '')
+        question_count = settings.QUIZ_QUESTION_COUNT
+        chunks = split_transcript(safe_transcript, settings.QUIZ_CHUNK_TOKENS)
+        if not chunks:
+            # Whitespace only: nothing to ask the model about.
+            return {'success': False, 'error': 'Transcript text is empty.', 'questions': []}
+        llm_output = load_checkpoint(run_key, Stage.LLM_OUTPUT) or {}
+        resumed_from = Stage.LLM_OUTPUT if llm_output else None
+
+        if len(chunks) == 1:
+            prompt = get_prompt(chunks[0], question_count)
+            key = prompt_key(prompt)
+            quiz_content, usage = llm_output.get(key) or stream_quiz(prompt, on_question)
+            formatted_quiz = parse_quiz_output(quiz_content)
+            if key not in llm_output:
+                save_checkpoint(run_key, Stage.LLM_OUTPUT, {key: [quiz_content, usage]})
+            formatted_quiz['questions'] = drop_invalid_questions([formatted_quiz.get('questions', [])])[0]
+            usages = [usage]
+        else:
+            per_chunk = max(2, -(-question_count * 3 // (2 * len(chunks))))
+            prompts = [
+                get_chunk_prompt(chunk, index + 1, len(chunks), per_chunk)
+                for index, chunk in enumerate(chunks)
+            ]
+            # Only the chunks without a usable output from an earlier run go to the model.
+            pending = [prompt for prompt in prompts if prompt_key(prompt) not in llm_output]
+            responses = {}
+            if pending:
+                responses = dict(zip(pending, run_async(generate_many(pending, settings.QUIZ_LLM_CONCURRENCY, schema=QuizSchema))))
+            results = []
+            fresh_output = {}
+            for prompt in prompts:
+                key = prompt_key(prompt)
+                result = chunk_questions(llm_output.get(key) or responses[prompt], prompt)
+                if key not in llm_output and result[0] is not None:
+                    fresh_output[key] = list(responses[prompt])
+                results.append(result)
+            if fresh_output:
+                save_checkpoint(run_key, Stage.LLM_OUTPUT, {**llm_output, **fresh_output})
+            usages = [usage for _, usage in results]
+            chunk_quizzes = [quiz for quiz, _ in results if quiz]
+            if not chunk_quizzes:
+                raise ValueError('Gemini failed for every transcript chunk.')
+            question_lists = drop_invalid_questions([quiz.get('questions', []) for quiz in chunk_quizzes])
+            questions = select_questions(question_lists, question_count)
+            formatted_quiz = {
+                'title': chunk_quizzes[0].get('title', 'Generated Quiz'),
+                'description': chunk_quizzes[0].get('description', ''),
+                'questions': questions,
+            }
+
+        minimum = min(settings.QUIZ_MIN_QUESTIONS, question_count)
+        if len(formatted_quiz['questions']) < minimum:
+            # Replaying this output would fail the same way, so a retry asks the model again.
+            clear_checkpoints(run_key, [Stage.LLM_OUTPUT])
+            return {
+                'success': False,
+                'error': f"The model produced {len(formatted_quiz['questions'])} valid question(s), at least {minimum} are needed.",
+            }
+
+        usage = {
+            'chunks': len(chunks),
+            'prompt_tokens': sum(item['prompt_tokens'] for item in usages),
+            'output_tokens': sum(item['output_tokens'] for item in usages),
+        }
+        logger.info(
+            'Generated quiz from %d transcript chunk(s): %d prompt tokens, %d output tokens',
+            usage['chunks'], usage['prompt_tokens'], usage['output_tokens'],
         )
-        quiz_content = response.text.strip()
-        formatted_quiz = check_content_formatting(quiz_content)
-        return {'success': True, 'quiz_content': formatted_quiz}
+        save_checkpoint(run_key, Stage.QUIZ, {'quiz': formatted_quiz, 'usage': usage})
+        return {'success': True, 'quiz_content': formatted_quiz, 'usage': usage, 'resumed_from': resumed_from}
     except Exception as e:
-        return {'title': 'AI error', 'description':f'Something when wrong during the quiz generation: {str(e)}', 'questions': []}  
+        logger.warning('Quiz generation failed: %s', e)
+        return {'success': False, 'error': f'Something when wrong during the quiz generation: {str(e)}'}
     
 def generate_quizzes_from_video(quiz):
     '''
@@ -184,54 +543,207 @@ def generate_quizzes_from_video(quiz):
     if not result['success']:
         return {'success': False, 'error': result['error'], 'questions': []}
     audio_file_path = result['file_path']
-    transcription_result = transcription_with_whisper(audio_file_path)
-    cleanup_media(audio_file_path)
+    model_size = select_model_size(result['duration'])
+    transcription_result = transcription_with_whisper(audio_file_path, model_size)
+    release_scratch_dir(result['scratch_dir'])
     if not transcription_result['success']:
         return {'success': False, 'error': transcription_result['error'], 'questions': []}
     transcript_text = transcription_result['transcript']
     quiz_res = generate_quizes_using_genmini_ai(transcript_text)
     if not quiz_res.get('success'):
-        return {'success': False, 'error': quiz_res.get('description', 'AI quiz generation failed.'), 'questions': []}
+        return {'success': False, 'error': quiz_res.get('error', 'AI quiz generation failed.'), 'questions': []}
     quiz_data = quiz_res.get('quiz_content', {})
-    quiz.title = quiz_data.get('title', 'Generated Quiz')
-    quiz.description = quiz_data.get('description', '')
-    quiz.save()
-
-    for question_data in quiz_data.get('questions', []):
-        question = Question(
-            quiz=quiz,
-            question_title=question_data.get('question_title', ''),
-            question_options=question_data.get('question_options', []),
-            answer=question_data.get('answer', '')
-        )
-        question.save()
-    return quiz
+    return save_generated_quiz(quiz.owner, quiz.video_url, quiz_data, quiz=quiz, transcription_model=model_size)
+
 
-def generate_quiz_from_youtube(video_url: str, quiz_id=None) -> dict:
+def get_transcript(video_url, quiz_id=None, progress=None, video_key=None):
     '''
-    Full pipeline: YouTube → audio → transcript → Gemini quiz JSON
+    Produce a transcript, preferring the video captions over downloading and transcribing the audio.
+    A downloaded audio file is checkpointed under `video_key` and only removed once it is
+    transcribed, so a failed transcription is retried without downloading again.
+    The Whisper model size is picked per job from the audio length and the node load (see model_policy),
+    and long pauses are cut from the audio before it is transcribed (see remove_silence).
+
+    Args:
+        video_url (str): YouTube video URL.
+        quiz_id: Identifier used in the name of the scratch directory.
+        progress (callable): Optional callback(stage, percent).
+        video_key (str): Canonical video key the audio checkpoint is stored under.
+
+    Returns:
+        dict: {'success': True, 'transcript': '...', 'source': 'captions' | 'whisper', 'title': '...',
+            'seconds': float, 'model': Whisper model size or '', 'vad_removed_seconds': float}
+            or {'success': False, 'error': '...'}
     '''
+    started = time.perf_counter()
+    if settings.CAPTIONS_FIRST:
+        report_progress(progress, 'fetching_captions', 5)
+        captions = fetch_captions(video_url)
+        if captions['success']:
+            return {
+                'success': True,
+                'transcript': captions['transcript'],
+                'source': 'captions',
+                'title': captions['title'],
+                'seconds': time.perf_counter() - started,
+                'model': '',
+                'vad_removed_seconds': 0.0,
+            }
 
-    download = download_audio_from_url(video_url, quiz_id)
-    if not download['success']:
-        return download
-    
-    print("Audio downloaded to:", download)
+    if settings.AUDIO_PIPELINE_MODE == 'stream':
+        report_progress(progress, 'waiting_for_transcription_slot', 10)
+        with transcription_slot():
+            report_progress(progress, 'transcribing', 10)
+            transcript_res = transcribe_audio_stream(video_url)
+        if not transcript_res['success']:
+            return transcript_res
+        return {
+            'success': True,
+            'transcript': transcript_res['transcript'],
+            'source': 'whisper',
+            'title': transcript_res['title'],
+            'seconds': time.perf_counter() - started,
+            'model': transcript_res['model'],
+            'vad_removed_seconds': transcript_res['vad_removed_seconds'],
+        }
+
+    audio = load_checkpoint(video_key, Stage.AUDIO)
+    if audio is not None and os.path.exists(audio['file_path']):
+        download = {'success': True, **audio}
+    else:
+        report_progress(progress, 'downloading', 10)
+        download = download_audio_from_url(video_url, quiz_id)
+        if not download['success']:
+            return download
+        save_checkpoint(video_key, Stage.AUDIO, {
+            'file_path': download['file_path'],
+            'scratch_dir': download['scratch_dir'],
+            'title': download['title'],
+            'duration': download['duration'],
+        })
+
+    logger.debug('Audio downloaded to %s', download['file_path'])
+
+    report_progress(progress, 'waiting_for_transcription_slot', 30)
+    with transcription_slot():
+        report_progress(progress, 'transcribing', 30)
+        speech = load_speech(download['file_path'], download.get('duration'))
+        if not speech['success']:
+            return speech
+        # The model is chosen for the audio that is left after trimming.
+        model_size = select_model_size(speech['duration'])
+        transcript_res = transcription_with_whisper(speech['audio'], model_size)
+    if not transcript_res['success']:
+        return transcript_res
+    release_scratch_dir(download.get('scratch_dir'))
+    clear_checkpoints(video_key, [Stage.AUDIO])
+    return {
+        'success': True,
+        'transcript': transcript_res['transcript'],
+        'source': 'whisper',
+        'title': download['title'],
+        'seconds': time.perf_counter() - started,
+        'model': model_size,
+        'vad_removed_seconds': speech['removed_seconds'],
+    }
+
+
+def report_progress(progress, stage, percent):
+    '''
+    Forward a pipeline stage to the optional progress callback.
+    '''
+    if progress is not None:
+        progress(stage, percent)
+
+
+def get_shared_transcript(video_url, video_key, quiz_id=None, progress=None):
+    '''
+    Transcript of a video from the cache, or produced once for all concurrent requests of the video.
+
+    Requests for a video that is already being transcribed (by another thread through single_flight,
+    or by another process, which holds the key lock) wait for that transcription and read its result
+    instead of downloading and transcribing the video again.
+
+    Returns:
+        dict: get_transcript result plus 'cached' (read from the transcript cache) and
+            'coalesced' (produced by a concurrent request).
+    '''
+    def from_cache(entry, coalesced):
+        return {
+            'success': True,
+            'transcript': entry.transcript,
+            'source': entry.source or 'cache',
+            'title': None,
+            'model': entry.transcription_model,
+            'vad_removed_seconds': 0.0,
+            'cached': True,
+            'coalesced': coalesced,
+        }
+
+    cached = get_cached_transcript(video_key)
+    if cached is not None:
+        return from_cache(cached, coalesced=False)
+    if video_key is None:
+        return {**get_transcript(video_url, quiz_id, progress), 'cached': False, 'coalesced': False}
+
+    def transcribe_once():
+        with key_lock(video_key):
+            # Another process may have stored the transcript while this one waited for the lock.
+            cached = get_cached_transcript(video_key)
+            if cached is not None:
+                return from_cache(cached, coalesced=True)
+            transcript_res = get_transcript(video_url, quiz_id, progress, video_key)
+            if transcript_res['success']:
+                store_transcript(
+                    video_key,
+                    transcript_res['transcript'],
+                    transcript_res['seconds'],
+                    transcript_res['source'],
+                    transcript_res['model'],
+                )
+            return {**transcript_res, 'cached': False, 'coalesced': False}
 
-    transcript_res = transcription_with_whisper(download['file_path'])
-    cleanup_media(download['file_path'])
+    report_progress(progress, 'waiting_for_transcript', 5)
+    transcript_res, coalesced = single_flight(video_key, transcribe_once)
+    if coalesced:
+        return {**transcript_res, 'coalesced': True}
+    return transcript_res
+
+
+def generate_quiz_from_youtube(video_url: str, quiz_id=None, progress=None, on_question=None, run_key=None) -> dict:
+    '''
+    Full pipeline: YouTube → audio → transcript → Gemini quiz JSON
+    A cached transcript of the same video (see transcript_cache) skips download and transcription,
+    and concurrent requests for one video share a single transcription (see get_shared_transcript).
+
+    Args:
+        video_url (str): YouTube video URL.
+        quiz_id: Identifier used in the name of the scratch directory.
+        progress (callable): Optional callback(stage, percent) called when a stage starts.
+        on_question (callable): Optional callback(question dict) for questions streamed by the model.
+        run_key (str): Checkpoint key of the run; a retried run resumes from its last completed LLM stage.
+    '''
+    transcript_res = get_shared_transcript(video_url, canonical_video_key(video_url), quiz_id, progress)
     if not transcript_res['success']:
         return transcript_res
+    transcript = transcript_res['transcript']
 
-    quiz_res = generate_quizes_using_genmini_ai(transcript_res['transcript'])
+    report_progress(progress, 'generating', 70)
+    quiz_res = generate_quizes_using_genmini_ai(transcript, on_question, run_key)
     if not quiz_res.get('success'):
-        return {'success': False, 'error': quiz_res.get('description', 'AI quiz generation failed.')}
+        return {'success': False, 'error': quiz_res.get('error', 'AI quiz generation failed.')}
     quiz_data = quiz_res.get('quiz_content')
 
     return {
         'success': True,
         'quiz': quiz_data,
         'audio_path': video_url,
-        'title': download['title'],
+        'title': transcript_res['title'] or quiz_data.get('title'),
+        'transcript_source': transcript_res['source'],
+        'transcript_cached': transcript_res['cached'],
+        'transcript_coalesced': transcript_res['coalesced'],
+        'transcription_model': transcript_res['model'],
+        'vad_removed_seconds': round(transcript_res['vad_removed_seconds'], 1),
+        'usage': quiz_res.get('usage', {}),
+        'resumed_from': quiz_res.get('resumed_from'),
     }
-
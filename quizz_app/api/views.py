@@ -1,11 +1,27 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from auth_app.api.authentication import CookieJWTAuthentication
-from quizz_app.api.serializers import QuizAIGenerateCreateSerializer, QuizSerializer, QuizDetailSerializer
-from quizz_app.models import Quiz
+from quizz_app.api.admission import admission_stats, admit_generation, check_queue, refund_audio_minutes
+from quizz_app.api.jobs import enqueue_generation_job, fail_stale_jobs, is_stale
+from quizz_app.api.lazy import lazy_module_stats
+from quizz_app.api.transcript_cache import transcript_cache_stats
+from quizz_app.api.transcription_service import transcription_service_stats
+from quizz_app.api.pagination import QuizCursorPagination
+from quizz_app.api.readers import get_quiz_data, quiz_values, serialize_quiz_rows
+from quizz_app.api.response_cache import cached_response, list_version_key, quiz_version_key, response_cache_stats
+from quizz_app.api.scratch import scratch_stats
+from quizz_app.api.single_flight import single_flight_stats
+from quizz_app.api.serializers import QuizAIGenerateCreateSerializer, QuizSerializer, QuizDetailSerializer, QuizGenerationJobSerializer, QuizSummarySerializer
+from quizz_app.models import Quiz, QuizGenerationJob
 from quizz_app.api.permissions import IsOwner
 from core.throttling import AIGenerationThrottle, UserStandardThrottle
 
@@ -17,13 +33,31 @@ class QuizGenerateAPIView(APIView):
     authentication_classes = [CookieJWTAuthentication]
     permission_classes = [IsAuthenticated]
     throttle_classes = [AIGenerationThrottle]
+
+    def check_throttles(self, request):
+        # A replay starts no generation, so it must not use up the generation throttle.
+        self.replayed_job = self.get_replayed_job(request)
+        if self.replayed_job is None:
+            super().check_throttles(request)
+
+    def get_replayed_job(self, request):
+        '''
+        The job created by an earlier request with the same Idempotency-Key header, if any.
+        '''
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key or len(idempotency_key) > 255:
+            return None
+        return QuizGenerationJob.objects.filter(owner=request.user, idempotency_key=idempotency_key).first()
+
     def post(self, request):
         '''
-        Generate a quiz from a YouTube video URL.
+        Queue the generation of a quiz from a YouTube video URL.
+        A request repeating the Idempotency-Key header of an earlier one gets that request's job back.
         
         :param self: descript the instance of the class
         :param request: Describe the HTTP request object
-        :return: Response with the created quiz data or error message
+        :return: 202 response with the job id and the URL to poll for its status,
+            429 when the user's audio-minute budget is used up, 503 when the generation queue is full
         '''
         serializer = QuizAIGenerateCreateSerializer(
             data=request.data,
@@ -31,23 +65,77 @@ class QuizGenerateAPIView(APIView):
         )
 
         serializer.is_valid(raise_exception=True)
-        quiz = serializer.save()
+        video_url = serializer.validated_data['url']
+        idempotency_key = request.headers.get('Idempotency-Key') or None
+        if idempotency_key is not None:
+            if len(idempotency_key) > 255:
+                raise ValidationError({'Idempotency-Key': 'Must be at most 255 characters.'})
+            if self.replayed_job is not None:
+                return self.job_response(self.replayed_job, video_url, replayed=True)
+
+        preflight = admit_generation(request.user, video_url)
+        try:
+            with transaction.atomic():
+                job = serializer.save(idempotency_key=idempotency_key)
+        except IntegrityError:
+            # A concurrent request with the same key created the job first and paid for the video.
+            refund_audio_minutes(request.user, preflight['duration'])
+            job = QuizGenerationJob.objects.get(owner=request.user, idempotency_key=idempotency_key)
+            return self.job_response(job, video_url, replayed=True)
+        enqueue_generation_job(job)
+        return self.job_response(job, video_url)
 
-        return Response(QuizSerializer(quiz).data, status=status.HTTP_201_CREATED)
+    def job_response(self, job, video_url, replayed=False):
+        if job.video_url != video_url:
+            raise ValidationError({'Idempotency-Key': 'This key was already used for another video.'})
+        status_url = reverse('quiz-job-detail', kwargs={'pk': job.pk})
+        data = QuizGenerationJobSerializer(job).data
+        data['job_id'] = job.pk
+        data['status_url'] = status_url
+        headers = {'Location': status_url}
+        if replayed:
+            headers['Idempotent-Replayed'] = 'true'
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers=headers)
 
 class QuizListView(generics.ListAPIView):
     '''
-    View to list quizzes for the authenticated user.
+    View to list quizzes for the authenticated user, newest first, with cursor pagination.
+    Each quiz has a question_count; `?include=questions` embeds the full questions instead.
+    Responses are built from `.values()` rows (see readers.py), in the shape of the serializers,
+    and cached per user with an ETag (see response_cache.py).
     '''
     authentication_classes = [CookieJWTAuthentication]
     permission_classes = [IsAuthenticated]
     throttle_classes = [UserStandardThrottle]
-    serializer_class = QuizSerializer
+    pagination_class = QuizCursorPagination
+
+    def include_questions(self):
+        return self.request.query_params.get('include') == 'questions'
+
+    def get_serializer_class(self):
+        if self.include_questions():
+            return QuizSerializer
+        return QuizSummarySerializer
 
     def get_queryset(self):
-        return Quiz.objects.prefetch_related('questions').filter(owner=self.request.user)
+        queryset = Quiz.objects.filter(owner=self.request.user)
+        if self.include_questions():
+            return quiz_values(queryset)
+        return quiz_values(queryset.annotate(question_count=Count('questions')))
 
+    def list(self, request, *args, **kwargs):
+        '''
+        Return one page of quizzes without instantiating serializers, or 304 if the client's copy is current.
+        
+        :param self: descript the instance of the class
+        :param request: Describe the HTTP request object
+        :return: Paginated response with the quizzes of the page
+        '''
+        def build():
+            page = self.paginate_queryset(self.get_queryset())
+            return self.get_paginated_response(serialize_quiz_rows(page, self.include_questions())).data
 
+        return cached_response(request, list_version_key(request.user.pk), build)
 
 
 class QuizRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
@@ -59,3 +147,117 @@ class QuizRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = QuizDetailSerializer
     permission_classes = [IsAuthenticated, IsOwner]
     throttle_classes = [UserStandardThrottle]
+
+    def retrieve(self, request, *args, **kwargs):
+        '''
+        Return the quiz with its questions, built from `.values()` rows, or 304 if the client's copy is current.
+        
+        :param self: descript the instance of the class
+        :param request: Describe the HTTP request object
+        :return: Response with the quiz in the QuizDetailSerializer shape
+        '''
+        def build():
+            data = get_quiz_data(self.kwargs['pk'])
+            if data is None:
+                raise Http404
+            # Same rule as IsOwner, checked on the owner id so no model instance is needed.
+            if data['owner'] != request.user.pk:
+                self.permission_denied(request)
+            return data
+
+        return cached_response(request, quiz_version_key(self.kwargs['pk']), build)
+
+
+class QuizGenerationJobView(generics.RetrieveAPIView):
+    '''
+    View to poll the status of a quiz generation job.
+    '''
+    authentication_classes = [CookieJWTAuthentication]
+    queryset = QuizGenerationJob.objects.all()
+    serializer_class = QuizGenerationJobSerializer
+    permission_classes = [IsAuthenticated, IsOwner]
+    throttle_classes = [UserStandardThrottle]
+
+    def get_object(self):
+        job = super().get_object()
+        # A job orphaned by a restart is reported as failed instead of pending forever.
+        # Polls of live jobs only read; the heartbeat thread sweeps the rest of the table.
+        if is_stale(job) and fail_stale_jobs(pk=job.pk):
+            job.refresh_from_db()
+        return job
+
+
+class QuizGenerationJobRetryView(generics.GenericAPIView):
+    '''
+    View to run a failed quiz generation job again.
+    '''
+    authentication_classes = [CookieJWTAuthentication]
+    queryset = QuizGenerationJob.objects.all()
+    permission_classes = [IsAuthenticated, IsOwner]
+    throttle_classes = [AIGenerationThrottle]
+
+    def post(self, request, *args, **kwargs):
+        '''
+        Queue a failed job again. The job resumes from its checkpoints, so the audio,
+        transcript and model output of the failed run are not produced twice.
+        
+        :param self: descript the instance of the class
+        :param request: Describe the HTTP request object
+        :return: 202 response with the job and the URL to poll for its status,
+            409 when the job has not failed, 503 when the generation queue is full
+        '''
+        job = self.get_object()
+        if is_stale(job) and fail_stale_jobs(pk=job.pk):
+            job.refresh_from_db()
+        if job.status != QuizGenerationJob.Status.FAILED:
+            return Response({'detail': 'Only failed jobs can be retried.'}, status=status.HTTP_409_CONFLICT)
+        check_queue()
+
+        with transaction.atomic():
+            updated = QuizGenerationJob.objects.filter(pk=job.pk, status=QuizGenerationJob.Status.FAILED).update(
+                status=QuizGenerationJob.Status.PENDING,
+                stage='queued',
+                progress=0,
+                preview_questions=[],
+                error='',
+                finished_at=None,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                # A concurrent retry queued the job first.
+                return Response({'detail': 'Only failed jobs can be retried.'}, status=status.HTTP_409_CONFLICT)
+            enqueue_generation_job(job)
+        job.refresh_from_db()
+
+        status_url = reverse('quiz-job-detail', kwargs={'pk': job.pk})
+        data = QuizGenerationJobSerializer(job).data
+        data['job_id'] = job.pk
+        data['status_url'] = status_url
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+class PipelineStatsView(APIView):
+    '''
+    View exposing cache and pipeline counters to staff users.
+    '''
+    authentication_classes = [CookieJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    throttle_classes = [UserStandardThrottle]
+
+    def get(self, request):
+        '''
+        Return the pipeline statistics.
+        
+        :param self: descript the instance of the class
+        :param request: Describe the HTTP request object
+        :return: Response with one entry per pipeline component
+        '''
+        return Response({
+            'transcript_cache': transcript_cache_stats(),
+            'response_cache': response_cache_stats(),
+            'admission': admission_stats(),
+            'single_flight': single_flight_stats(),
+            'lazy_imports': lazy_module_stats(),
+            'transcription_service': transcription_service_stats(),
+            'scratch': scratch_stats(),
+        })
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QuizzAppConfig(AppConfig):
     name = 'quizz_app'
+
+    def ready(self):
+        from quizz_app import signals  # noqa: F401
+
+        # With the transcription service, only the service process loads models.
+        if settings.WHISPER_PRELOAD_MODELS and settings.TRANSCRIPTION_BACKEND == 'local':
+            from quizz_app.api.model_registry import warm_whisper_models
+            warm_whisper_models()
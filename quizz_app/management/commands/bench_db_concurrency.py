@@ -0,0 +1,107 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import Count
+
+from quizz_app.api.readers import quiz_values, serialize_quiz_rows
+from quizz_app.api.serializers import save_generated_quiz
+from quizz_app.models import Question, Quiz
+
+
+PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')
+
+
+class Command(BaseCommand):
+    help = (
+        'Run quiz list reads and quiz generation writes concurrently against the configured database '
+        'and report the throughput. Compare runs with and without DB_PROFILE=production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--quizzes', type=int, default=200, help='Quizzes of the synthetic user before the run.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in PRAGMAS}
+            self.stdout.write(' '.join(f'{name}={value}' for name, value in pragmas.items()))
+
+        user = User.objects.create_user(username=f'bench-{time.time_ns()}', password=None)
+        try:
+            self.create_quizzes(user, options['quizzes'])
+            results = self.run(user, options['readers'], options['writers'], options['seconds'])
+        finally:
+            user.delete()
+
+        for kind in ('read', 'write'):
+            latencies = results[kind]
+            line = f'{kind}s: {len(latencies) / options["seconds"]:8.1f}/s, errors: {results[kind + "_errors"]}'
+            if len(latencies) > 1:
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                line += f', median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms'
+            self.stdout.write(line)
+
+    def create_quizzes(self, user, count):
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(owner=user, title=f'Quiz {index}', description='Benchmark quiz.') for index in range(count)
+        ])
+        options = ['one', 'two', 'three', 'four']
+        Question.objects.bulk_create([
+            Question(quiz=quiz, question_title=f'Question {index}?', question_options=options, answer='one')
+            for quiz in quizzes
+            for index in range(10)
+        ])
+
+    def run(self, user, readers, writers, seconds):
+        results = {'read': [], 'write': [], 'read_errors': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        quiz_data = {
+            'title': 'Benchmark quiz',
+            'description': 'Written while the list is read.',
+            'questions': [
+                {'question_title': f'Question {index}?', 'question_options': ['a', 'b', 'c', 'd'], 'answer': 'a'}
+                for index in range(10)
+            ],
+        }
+
+        def read():
+            queryset = Quiz.objects.filter(owner=user).annotate(question_count=Count('questions'))
+            serialize_quiz_rows(list(quiz_values(queryset.order_by('-created_at', '-id'))[:20]), include_questions=False)
+
+        def write():
+            save_generated_quiz(user, 'https://www.youtube.com/watch?v=benchmark', quiz_data)
+
+        def worker(kind, operation):
+            latencies, errors = [], 0
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        operation()
+                    except OperationalError:
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                results[kind].extend(latencies)
+                results[kind + '_errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=('read', read)) for _ in range(readers)]
+        threads += [threading.Thread(target=worker, args=('write', write)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return results
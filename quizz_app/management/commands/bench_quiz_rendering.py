@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.middleware import brotli
+from core.renderers import ORJSONRenderer
+from quizz_app.api.response_cache import get_cache, list_version_key
+from quizz_app.api.views import QuizListView
+from quizz_app.models import Question, Quiz
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON renderers and response compression on the quiz list of a synthetic user (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quizzes', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per renderer and page set.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.create_user(options['quizzes'], options['questions'])
+            try:
+                for label, query in (('summaries', ''), ('with questions', '&include=questions')):
+                    pages = self.fetch_pages(user, query)
+                    self.report(label, pages, options['repeat'])
+            finally:
+                get_cache().delete(list_version_key(user.pk))
+                transaction.set_rollback(True)
+
+    def create_user(self, quiz_count, question_count):
+        user = User.objects.create_user(username=f'bench-{time.time_ns()}', password=None)
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(owner=user, title=f'Quiz {index}', description='A synthetic quiz about the history of computing.',
+                 video_url=f'https://www.youtube.com/watch?v=bench{index:06d}')
+            for index in range(quiz_count)
+        ])
+        options = ['Charles Babbage', 'Ada Lovelace', 'Alan Turing', 'Grace Hopper']
+        Question.objects.bulk_create([
+            Question(quiz=quiz, question_title=f'Who is known for contribution number {index}?',
+                     question_options=options, answer=options[index % 4])
+            for quiz in quizzes
+            for index in range(question_count)
+        ])
+        return user
+
+    def fetch_pages(self, user, query):
+        '''
+        Walk the quiz list through QuizListView with the largest page size, returning the data of every page.
+        '''
+        factory = APIRequestFactory()
+        view = QuizListView.as_view()
+        pages = []
+        url = f'/api/quizzes/?page_size={QuizListView.pagination_class.max_page_size}{query}'
+        while url:
+            request = factory.get(url, HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            force_authenticate(request, user=user)
+            response = view(request)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def report(self, label, pages, repeat):
+        self.stdout.write(f'{label}: {len(pages)} pages')
+        for renderer in (JSONRenderer(), ORJSONRenderer()):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                bodies = [renderer.render(page) for page in pages]
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+            self.stdout.write(f'  {type(renderer).__name__:<15} {elapsed_ms:8.2f} ms  {sum(map(len, bodies)):>9} bytes')
+
+        encoders = [('gzip', compress_string)]
+        if brotli is not None:
+            encoders.append(('br', lambda body: brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)))
+        for name, compress in encoders:
+            started = time.perf_counter()
+            size = sum(len(compress(body)) for body in bodies)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'  {name:<15} {elapsed_ms:8.2f} ms  {size:>9} bytes')
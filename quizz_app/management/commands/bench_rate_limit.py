@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rate_limit import RateLimitStore
+
+
+def take_units(path, attempts, start_event, results):
+    '''
+    Worker process: run `attempts` checks on one shared key and report how long they took.
+    '''
+    store = RateLimitStore(path)
+    start_event.wait()
+    started = time.perf_counter()
+    for _ in range(attempts):
+        store.acquire('bench', emission_interval=1, burst=attempts)
+    results.put(time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the throughput of the shared rate limit store (core/rate_limit.py) with several '
+        'processes checking the same key at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--checks', type=int, default=2000, help='Checks per process.')
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rate_limit.sqlite3')
+            start_event = context.Event()
+            results = context.Queue()
+            processes = [
+                context.Process(target=take_units, args=(path, options['checks'], start_event, results))
+                for _ in range(options['processes'])
+            ]
+            for process in processes:
+                process.start()
+            start_event.set()
+            seconds = max(results.get(timeout=300) for _ in processes)
+            for process in processes:
+                process.join()
+
+        checks = options['processes'] * options['checks']
+        self.stdout.write(f'{checks} checks in {seconds:.2f}s over {len(processes)} processes: {checks / seconds:.0f} checks/s')
@@ -0,0 +1,59 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+
+# Runs in a fresh interpreter: start Django and load the URLconf like a web worker does.
+WORKER_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if sys.argv[1] == 'eager':
+    from quizz_app.api.lazy import LAZY_MODULES
+    for module in LAZY_MODULES:
+        module.load()
+seconds = time.perf_counter() - started
+from quizz_app.api.model_registry import peak_memory_mb, resident_memory_mb
+heavy = [name for name in ('torch', 'whisper', 'yt_dlp', 'google.genai', 'tiktoken') if name in sys.modules]
+print(json.dumps({'seconds': seconds, 'rss_mb': resident_memory_mb(), 'peak_rss_mb': peak_memory_mb(), 'heavy_modules': heavy}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the startup time and memory of a web worker (Django setup and URLconf) in fresh processes, '
+        'with the pipeline dependencies loaded lazily and, for comparison, eagerly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Worker processes started per mode.')
+
+    def handle(self, *args, **options):
+        for mode in ('lazy', 'eager'):
+            samples = [self.start_worker(mode) for _ in range(options['runs'])]
+            seconds = statistics.median(sample['seconds'] for sample in samples)
+            heavy = ', '.join(samples[-1]['heavy_modules']) or 'none'
+            self.stdout.write(f'{mode:5}  startup {seconds:.2f}s  {self.memory(samples)}  heavy modules: {heavy}')
+
+    def memory(self, samples):
+        # The current RSS needs /proc; elsewhere the peak RSS of the worker is shown.
+        for key, label in (('rss_mb', 'RSS'), ('peak_rss_mb', 'peak RSS')):
+            values = [sample[key] for sample in samples if sample[key] is not None]
+            if values:
+                return f'{label} {statistics.median(values):.0f} MB'
+        return 'RSS unknown'
+
+    def start_worker(self, mode):
+        output = subprocess.run(
+            [sys.executable, '-c', WORKER_SCRIPT, mode],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
@@ -0,0 +1,42 @@
+import time
+
+import whisper
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quizz_app.api.audio import SAMPLE_RATE
+from quizz_app.api.model_registry import get_whisper_model
+from quizz_app.api.parallel_transcription import transcribe_parallel
+
+
+class Command(BaseCommand):
+    help = 'Compare serial Whisper transcription of an audio file with the parallel segmented mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('audio_path')
+        parser.add_argument('--model-size', default=settings.WHISPER_MODEL_SIZE)
+        parser.add_argument('--workers', type=int, default=max(settings.WHISPER_PARALLEL_WORKERS, 2))
+        parser.add_argument('--segment-seconds', type=int, default=settings.WHISPER_SEGMENT_SECONDS)
+
+    def handle(self, *args, **options):
+        samples = whisper.load_audio(options['audio_path'])
+        audio_seconds = len(samples) / SAMPLE_RATE
+        device = settings.WHISPER_DEVICE
+        self.stdout.write(f'Audio: {audio_seconds:.0f}s, model: {options["model_size"]}')
+
+        model = get_whisper_model(options['model_size'], device)
+        started = time.perf_counter()
+        model.transcribe(samples, fp16=False)
+        serial_seconds = time.perf_counter() - started
+        self.stdout.write(f'serial:   {serial_seconds:.1f}s')
+
+        # The first call spawns the workers and loads one model per worker; time the warm pool.
+        transcribe_parallel(samples[:SAMPLE_RATE], options['model_size'], device, options['workers'], options['segment_seconds'])
+        started = time.perf_counter()
+        transcribe_parallel(samples, options['model_size'], device, options['workers'], options['segment_seconds'])
+        parallel_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'parallel: {parallel_seconds:.1f}s with {options["workers"]} workers, '
+            f'{options["segment_seconds"]}s segments'
+        )
+        self.stdout.write(self.style.SUCCESS(f'speedup:  {serial_seconds / parallel_seconds:.2f}x'))
@@ -0,0 +1,102 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from quizz_app.api.llm import build_fake_quiz
+from quizz_app.api.transcript_chunks import count_tokens
+
+
+STREAM_PIECES = 20
+
+
+def make_handler(latency):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        '''
+        Answers Gemini `models/<model>:generateContent` and `:streamGenerateContent` calls with a generated quiz.
+        '''
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            if not path.endswith((':generateContent', ':streamGenerateContent')):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            prompt = ''.join(
+                part.get('text', '')
+                for content in body.get('contents', [])
+                for part in content.get('parts', [])
+            )
+            text = build_fake_quiz(prompt)
+            usage = {
+                'promptTokenCount': count_tokens(prompt),
+                'candidatesTokenCount': count_tokens(text),
+            }
+            if path.endswith(':streamGenerateContent'):
+                self.stream_response(text, usage)
+                return
+
+            if latency:
+                time.sleep(latency)
+            payload = json.dumps(self.make_response(text, usage)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def make_response(self, text, usage=None):
+            response = {
+                'candidates': [{
+                    'content': {'role': 'model', 'parts': [{'text': text}]},
+                    'finishReason': 'STOP' if usage else None,
+                }],
+            }
+            if usage:
+                response['usageMetadata'] = usage
+            return response
+
+        def stream_response(self, text, usage):
+            '''
+            Server-sent events in chunked transfer encoding, `latency` spread over the pieces.
+            '''
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            piece_length = -(-len(text) // STREAM_PIECES)
+            pieces = [text[start:start + piece_length] for start in range(0, len(text), piece_length)]
+            for index, piece in enumerate(pieces):
+                if latency:
+                    time.sleep(latency / len(pieces))
+                last = index == len(pieces) - 1
+                event = f'data: {json.dumps(self.make_response(piece, usage if last else None))}\r\n\r\n'.encode('utf-8')
+                self.wfile.write(f'{len(event):x}\r\n'.encode('ascii') + event + b'\r\n')
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeGeminiHandler
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stand-in for the Gemini API (set GEMINI_BASE_URL to its address).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering.')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer((options['host'], options['port']), make_handler(options['latency']))
+        self.stdout.write(f'Fake Gemini API on http://{options["host"]}:{options["port"]}/ (latency {options["latency"]}s)')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quizz_app.api.transcription_service import TranscriptionServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the transcription service: one process holding the Whisper model that workers '
+        'send their audio to when TRANSCRIPTION_BACKEND=service.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.TRANSCRIPTION_SERVICE_SOCKET)
+        parser.add_argument('--model-size', default=settings.WHISPER_MODEL_SIZE)
+
+    def handle(self, *args, **options):
+        server = TranscriptionServer(options['socket'], options['model_size'])
+        self.stdout.write(f'Transcription service on {options["socket"]} (model {options["model_size"]})')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
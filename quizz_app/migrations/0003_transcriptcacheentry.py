@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizz_app', '0002_quizgenerationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_key', models.CharField(max_length=255, unique=True)),
+                ('transcript', models.TextField()),
+                ('size_bytes', models.PositiveIntegerField()),
+                ('transcription_seconds', models.FloatField(default=0)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Transcript cache entry',
+                'verbose_name_plural': 'Transcript cache entries',
+            },
+        ),
+    ]
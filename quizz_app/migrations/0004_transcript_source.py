@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizz_app', '0003_transcriptcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizgenerationjob',
+            name='transcript_source',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='transcriptcacheentry',
+            name='source',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+    ]
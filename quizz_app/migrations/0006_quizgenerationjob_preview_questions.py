@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizz_app', '0005_quizgenerationjob_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizgenerationjob',
+            name='preview_questions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
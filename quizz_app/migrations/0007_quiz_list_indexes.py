@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizz_app', '0006_quizgenerationjob_preview_questions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'id'], name='question_quiz_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['owner', 'created_at'], name='quiz_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizz_app', '0007_quiz_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizgenerationjob',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='quizgenerationjob',
+            constraint=models.UniqueConstraint(fields=('owner', 'idempotency_key'), name='unique_job_idempotency_key'),
+        ),
+    ]
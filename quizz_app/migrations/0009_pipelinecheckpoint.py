@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizz_app', '0008_quizgenerationjob_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('stage', models.CharField(choices=[('metadata', 'Metadata'), ('audio', 'Audio'), ('llm_output', 'Raw LLM output'), ('quiz', 'Parsed quiz')], max_length=16)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Pipeline checkpoint',
+                'verbose_name_plural': 'Pipeline checkpoints',
+                'constraints': [models.UniqueConstraint(fields=('key', 'stage'), name='unique_checkpoint_stage')],
+            },
+        ),
+    ]
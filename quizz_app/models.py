@@ -7,12 +7,16 @@ class Quiz(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     video_url = models.URLField(blank=True, null=True)
+    transcription_model = models.CharField(max_length=16, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Quiz'
         verbose_name_plural = 'Quizzes'
+        indexes = [
+            models.Index(fields=['owner', 'created_at'], name='quiz_owner_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -30,6 +34,97 @@ class Question(models.Model):
     class Meta:
         verbose_name = 'Question'
         verbose_name_plural = 'Questions'
+        indexes = [
+            models.Index(fields=['quiz', 'id'], name='question_quiz_id_idx'),
+        ]
     
     def __str__(self):
-        return self.question_title
\ No newline at end of file
+        return self.question_title
+
+
+class QuizGenerationJob(models.Model):
+    '''
+    A quiz generation request processed outside the request/response cycle.
+    '''
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='generation_jobs')
+    video_url = models.URLField(max_length=500)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    stage = models.CharField(max_length=32, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)
+    transcript_source = models.CharField(max_length=16, blank=True)
+    metrics = models.JSONField(default=dict, blank=True)
+    preview_questions = models.JSONField(default=list, blank=True)
+    quiz = models.ForeignKey('Quiz', related_name='generation_jobs', on_delete=models.SET_NULL, null=True, blank=True)
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Quiz generation job'
+        verbose_name_plural = 'Quiz generation jobs'
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'idempotency_key'], name='unique_job_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.video_url} ({self.status})'
+
+
+class TranscriptCacheEntry(models.Model):
+    '''
+    Transcript of a video shared by every user who submits it, keyed by extractor and video id.
+    '''
+    video_key = models.CharField(max_length=255, unique=True)
+    transcript = models.TextField()
+    source = models.CharField(max_length=16, blank=True)
+    transcription_model = models.CharField(max_length=16, blank=True)
+    size_bytes = models.PositiveIntegerField()
+    transcription_seconds = models.FloatField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Transcript cache entry'
+        verbose_name_plural = 'Transcript cache entries'
+
+    def __str__(self):
+        return self.video_key
+
+
+class PipelineCheckpoint(models.Model):
+    '''
+    Output of a completed generation stage, kept until expires_at so a retried job resumes after it.
+    Video stages are keyed by the canonical video key, LLM stages by the job.
+    The transcript stage is kept in TranscriptCacheEntry.
+    '''
+    class Stage(models.TextChoices):
+        METADATA = 'metadata', 'Metadata'
+        AUDIO = 'audio', 'Audio'
+        LLM_OUTPUT = 'llm_output', 'Raw LLM output'
+        QUIZ = 'quiz', 'Parsed quiz'
+
+    key = models.CharField(max_length=255)
+    stage = models.CharField(max_length=16, choices=Stage.choices)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Pipeline checkpoint'
+        verbose_name_plural = 'Pipeline checkpoints'
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'stage'], name='unique_checkpoint_stage'),
+        ]
+
+    def __str__(self):
+        return f'{self.key} ({self.stage})'
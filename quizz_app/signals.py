@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from quizz_app.api.response_cache import bump_versions, list_version_key, quiz_version_key
+from quizz_app.models import Question, Quiz
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_responses(sender, instance, **kwargs):
+    bump_versions([quiz_version_key(instance.pk), list_version_key(instance.owner_id)])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_responses(sender, instance, **kwargs):
+    '''
+    Question changes show up in the quiz detail and in the owner's list (question_count).
+    bulk_create sends no signals; save_generated_quiz saves the quiz in the same transaction.
+    '''
+    owner_id = Quiz.objects.filter(pk=instance.quiz_id).values_list('owner_id', flat=True).first()
+    keys = [quiz_version_key(instance.quiz_id)]
+    if owner_id is not None:
+        keys.append(list_version_key(owner_id))
+    bump_versions(keys)
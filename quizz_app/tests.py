@@ -1,3 +1,583 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.rate_limit import RateLimitStore
+
+from quizz_app.api.audio import SAMPLE_RATE, is_silent, trim_silence
+from quizz_app.api.captions import fetch_captions, parse_vtt
+from quizz_app.api.checkpoints import Stage, load_checkpoint, save_checkpoint
+from quizz_app.api.utils import generate_quizes_using_genmini_ai
+from quizz_app.api.quiz_stream import QuizStreamParser
+from quizz_app.api.readers import get_quiz_data, quiz_values, serialize_quiz_rows
+from quizz_app.api.response_cache import get_cache, list_version_key
+from quizz_app.api.serializers import QuizDetailSerializer, QuizSerializer, QuizSummarySerializer
+from quizz_app.api.transcript_cache import canonical_video_key, get_cached_transcript, store_transcript
+from quizz_app.models import PipelineCheckpoint, Question, Quiz, QuizGenerationJob, TranscriptCacheEntry
+
+
+class QuizReadersTests(TestCase):
+    '''
+    The `.values()` read path must render exactly like the serializers.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='secret')
+        cls.quiz = Quiz.objects.create(
+            owner=cls.user,
+            title='Über Quiz "one"',
+            description='Ünïcode – and <html> & quotes',
+            video_url='https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        )
+        for index in range(3):
+            options = [f'Option {index}.{offset} é' for offset in range(4)]
+            Question.objects.create(
+                quiz=cls.quiz,
+                question_title=f'Question {index}?',
+                question_options=options,
+                answer=options[index],
+            )
+        cls.empty_quiz = Quiz.objects.create(owner=cls.user, title='Empty', description='', video_url=None)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_list_with_questions_matches_quiz_serializer(self):
+        queryset = Quiz.objects.filter(owner=self.user).order_by('-created_at', '-id')
+        expected = QuizSerializer(queryset.prefetch_related('questions'), many=True).data
+        actual = serialize_quiz_rows(list(quiz_values(queryset)), include_questions=True)
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_list_summary_matches_summary_serializer(self):
+        queryset = Quiz.objects.filter(owner=self.user).annotate(question_count=Count('questions')).order_by('-id')
+        expected = QuizSummarySerializer(queryset, many=True).data
+        actual = serialize_quiz_rows(list(quiz_values(queryset)), include_questions=False)
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_detail_matches_detail_serializer(self):
+        for quiz in (self.quiz, self.empty_quiz):
+            expected = QuizDetailSerializer(Quiz.objects.prefetch_related('questions').get(pk=quiz.pk)).data
+            self.assertEqual(self.render(get_quiz_data(quiz.pk)), self.render(expected))
+
+    def test_detail_of_missing_quiz_is_none(self):
+        self.assertIsNone(get_quiz_data(0))
+
+
+class TrimSilenceTests(SimpleTestCase):
+    '''
+    Voice-activity trimming must only remove pauses, never speech or steady sound.
+    '''
+    def setUp(self):
+        self.time = np.arange(SAMPLE_RATE * 60) / SAMPLE_RATE
+        # Syllables at 4 Hz, with a pause of about 1.3 s every 4 s.
+        syllables = (np.sin(2 * np.pi * 4 * self.time) > 0.3) & (np.sin(2 * np.pi * 0.25 * self.time) > -0.5)
+        self.voice = 0.3 * np.sin(2 * np.pi * 180 * self.time) * syllables
+
+    def test_pauses_between_speech_are_shortened(self):
+        noise = np.random.default_rng(0).normal(0, 0.0005, len(self.time))
+        samples = (self.voice + noise).astype(np.float32)
+        trimmed, removed = trim_silence(samples)
+        self.assertGreater(removed, 10)
+        self.assertAlmostEqual(len(samples) - len(trimmed), removed * SAMPLE_RATE, delta=1)
+
+    def test_voice_over_music_bed_is_kept(self):
+        music = 0.05 * sum(np.sin(2 * np.pi * frequency * self.time) for frequency in (330, 440, 550))
+        samples = (self.voice + music).astype(np.float32)
+        trimmed, removed = trim_silence(samples)
+        self.assertEqual(removed, 0.0)
+        self.assertEqual(len(trimmed), len(samples))
+
+    def test_steady_tone_is_kept(self):
+        samples = (0.3 * np.sin(2 * np.pi * 440 * self.time[:SAMPLE_RATE * 5])).astype(np.float32)
+        self.assertEqual(trim_silence(samples)[1], 0.0)
+
+    def test_digital_silence_is_removed(self):
+        samples = np.zeros(SAMPLE_RATE * 5, dtype=np.float32)
+        self.assertTrue(is_silent(samples))
+        self.assertGreater(trim_silence(samples)[1], 4)
+
+    def test_quiet_speech_is_not_silent(self):
+        self.assertFalse(is_silent((0.01 * self.voice).astype(np.float32)))
+
+
+class CaptionsTests(SimpleTestCase):
+    '''
+    Captions are read from the metadata admission already fetched.
+    '''
+    VTT = 'WEBVTT\n\n00:00:00.000 --> 00:00:02.000\nThe mitochondria is the powerhouse of the cell\n'
+
+    def preflight(self, info):
+        return {'success': True, 'url': 'https://www.youtube.com/watch?v=abc', 'title': 'Cells', 'duration': 60, 'format_id': None, 'info': info}
+
+    @override_settings(CAPTIONS_MIN_WORDS=3)
+    def test_captions_come_from_the_preflight_info(self):
+        info = {
+            'id': 'abc',
+            'title': 'Cells',
+            'subtitles': {},
+            'automatic_captions': {'en': [{'ext': 'json3', 'url': 'https://captions/json3'}, {'ext': 'vtt', 'url': 'https://captions/vtt'}]},
+        }
+        with mock.patch('quizz_app.api.captions.preflight_video', return_value=self.preflight(info)), \
+                mock.patch('yt_dlp.YoutubeDL.YoutubeDL.extract_info') as extract_info, \
+                mock.patch('yt_dlp.YoutubeDL.YoutubeDL.urlopen', return_value=io.BytesIO(self.VTT.encode('utf-8'))) as urlopen:
+            captions = fetch_captions('https://www.youtube.com/watch?v=abc')
+        extract_info.assert_not_called()
+        urlopen.assert_called_once_with('https://captions/vtt')
+        self.assertEqual(captions['transcript'], 'The mitochondria is the powerhouse of the cell')
+        self.assertEqual(captions['language'], 'en')
+
+    def test_rolling_captions_drop_the_line_repeated_from_the_previous_cue(self):
+        vtt = (
+            'WEBVTT\n\n'
+            '00:00:00.000 --> 00:00:02.000\nhello <c>world</c>\n\n'
+            '00:00:02.000 --> 00:00:04.000\nhello world\nthis is a test\n\n'
+            '00:00:04.000 --> 00:00:06.000\nthis is a test\nand more\n'
+        )
+        self.assertEqual(parse_vtt(vtt), 'hello world this is a test and more')
+
+    def test_lines_repeated_in_later_cues_are_kept(self):
+        vtt = (
+            'WEBVTT\n\n'
+            '00:00:00.000 --> 00:00:01.000\nYes.\n\n'
+            '00:00:01.000 --> 00:00:02.000\nNo.\n\n'
+            '00:00:02.000 --> 00:00:03.000\nYes.\n'
+        )
+        self.assertEqual(parse_vtt(vtt), 'Yes. No. Yes.')
+
+    def test_video_without_captions(self):
+        info = {'id': 'abc', 'title': 'Cells', 'subtitles': {}, 'automatic_captions': {}}
+        with mock.patch('quizz_app.api.captions.preflight_video', return_value=self.preflight(info)):
+            self.assertFalse(fetch_captions('https://www.youtube.com/watch?v=abc')['success'])
+
+
+def quiz_json(valid, invalid=0, part=1):
+    questions = [
+        {'question_title': f'Question {part}.{index}?', 'question_options': ['a', 'b', 'c', 'd'], 'answer': 'a'}
+        for index in range(valid)
+    ]
+    # Answers missing from the options fail QuestionSerializer validation.
+    questions += [
+        {'question_title': f'Broken {part}.{index}?', 'question_options': ['a', 'b', 'c', 'd'], 'answer': 'e'}
+        for index in range(invalid)
+    ]
+    return json.dumps({'title': 'Quiz', 'description': 'About things.', 'questions': questions})
+
+
+class QuizStreamParserTests(SimpleTestCase):
+    '''
+    Questions are parsed from the streamed JSON as soon as each one is complete.
+    '''
+    def test_questions_complete_one_at_a_time(self):
+        document = quiz_json(valid=3)
+        parser = QuizStreamParser()
+        completed = []
+        for index in range(0, len(document), 7):
+            for question in parser.feed(document[index:index + 7]):
+                completed.append((question, index + 7))
+        self.assertEqual([question for question, _ in completed], json.loads(document)['questions'])
+        # Each question is returned by the chunk that closes it, not at the end of the document.
+        received = [received for _, received in completed]
+        self.assertEqual(received, sorted(set(received)))
+        self.assertLess(received[0], len(document) // 2)
+
+    def test_braces_and_quotes_inside_strings_are_ignored(self):
+        question = {'question_title': 'What does "{x}" print?', 'question_options': ['}', ']', '\\"', '{'], 'answer': '}'}
+        document = json.dumps({'title': 'Escapes [ {', 'questions': [question]})
+        parser = QuizStreamParser()
+        completed = [item for char in document for item in parser.feed(char)]
+        self.assertEqual(completed, [question])
+
+    def test_nested_objects_outside_questions_are_not_returned(self):
+        document = json.dumps({'meta': {'questions': [{'a': 1}]}, 'questions': [{'b': 2}]})
+        self.assertEqual(QuizStreamParser().feed(document), [{'b': 2}])
+
+
+@override_settings(QUIZ_QUESTION_COUNT=10, QUIZ_MIN_QUESTIONS=5)
+class GeneratedQuestionValidationTests(SimpleTestCase):
+    '''
+    Invalid questions of the model are dropped on the single-call and the chunked path alike.
+    '''
+    usage = {'prompt_tokens': 10, 'output_tokens': 10}
+
+    def generate(self, chunks, outputs):
+        with mock.patch('quizz_app.api.utils.split_transcript', return_value=chunks), \
+                mock.patch('quizz_app.api.utils.stream_quiz', return_value=(outputs[0], self.usage)), \
+                mock.patch('quizz_app.api.utils.generate_many', mock.Mock()), \
+                mock.patch('quizz_app.api.utils.run_async', return_value=[(output, self.usage) for output in outputs]):
+            return generate_quizes_using_genmini_ai('A transcript.')
+
+    def test_single_call_drops_invalid_questions(self):
+        result = self.generate(['A transcript.'], [quiz_json(valid=9, invalid=1)])
+        self.assertTrue(result['success'])
+        self.assertEqual(len(result['quiz_content']['questions']), 9)
+
+    def test_chunks_drop_invalid_questions(self):
+        result = self.generate(['Part one.', 'Part two.'], [quiz_json(valid=6, invalid=2, part=1), quiz_json(valid=6, invalid=2, part=2)])
+        self.assertTrue(result['success'])
+        questions = result['quiz_content']['questions']
+        self.assertEqual(len(questions), 10)
+        self.assertFalse(any(question['answer'] == 'e' for question in questions))
+
+    def test_whitespace_transcript_is_empty(self):
+        result = generate_quizes_using_genmini_ai(' \n\t ')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'Transcript text is empty.')
+
+    def test_too_few_valid_questions_fail_on_both_paths(self):
+        for chunks in (['A transcript.'], ['Part one.', 'Part two.']):
+            with self.subTest(chunks=len(chunks)):
+                result = self.generate(chunks, [quiz_json(valid=2, invalid=8)] * len(chunks))
+                self.assertFalse(result['success'])
+                self.assertIn('at least 5', result['error'])
+
+
+class APITestMixin:
+    '''
+    An authenticated client with the throttles and budgets in a rate limit store of its own.
+    '''
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.rate_limit_store = RateLimitStore(os.path.join(directory.name, 'rate_limit.sqlite3'))
+        for target in ('core.throttling.get_rate_limit_store', 'quizz_app.api.admission.get_rate_limit_store'):
+            patcher = mock.patch(target, return_value=self.rate_limit_store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='api-user', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QuizGenerateIdempotencyTests(APITestMixin, TestCase):
+    '''
+    Requests repeating an Idempotency-Key get the job of the first request back.
+    '''
+    video_url = 'https://www.youtube.com/watch?v=abc'
+
+    def setUp(self):
+        super().setUp()
+        preflight = {'success': True, 'url': self.video_url, 'title': 'Video', 'duration': 120, 'format_id': None, 'info': None}
+        for target, value in (('quizz_app.api.admission.preflight_video', preflight), ('quizz_app.api.views.enqueue_generation_job', None)):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create(self, key, url=None):
+        return self.client.post(reverse('quiz-create'), {'url': url or self.video_url}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replays_do_not_use_up_the_generation_throttle(self):
+        first = self.create('key-1')
+        self.assertEqual(first.status_code, 202)
+        # AIGenerationThrottle allows 3 per hour; retries of a lost response are not new generations.
+        for _ in range(5):
+            replay = self.create('key-1')
+            self.assertEqual(replay.status_code, 202)
+            self.assertEqual(replay['Idempotent-Replayed'], 'true')
+            self.assertEqual(replay.data['job_id'], first.data['job_id'])
+        self.assertEqual(QuizGenerationJob.objects.count(), 1)
+
+    def test_key_reused_for_another_video_is_a_conflict(self):
+        self.assertEqual(self.create('key-1').status_code, 202)
+        response = self.create('key-1', url='https://www.youtube.com/watch?v=other')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Idempotency-Key', response.data)
+        self.assertEqual(QuizGenerationJob.objects.count(), 1)
+
+    def test_keys_are_scoped_to_the_user(self):
+        first = self.create('key-1')
+        other = User.objects.create_user(username='other-user', password='secret')
+        self.client.force_authenticate(other)
+        second = self.create('key-1')
+        self.assertEqual(second.status_code, 202)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertNotEqual(second.data['job_id'], first.data['job_id'])
+
+
+class OrphanedJobTests(APITestMixin, TestCase):
+    '''
+    Jobs lost with their worker process are reported as failed and can be retried.
+    '''
+    def create_job(self, status, age_seconds):
+        job = QuizGenerationJob.objects.create(owner=self.user, video_url='https://www.youtube.com/watch?v=abc', status=status)
+        QuizGenerationJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=age_seconds))
+        return job
+
+    @override_settings(QUIZ_JOB_STALE_SECONDS=300)
+    def test_polling_a_live_job_only_reads(self):
+        job = self.create_job(QuizGenerationJob.Status.RUNNING, age_seconds=10)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('quiz-job-detail', kwargs={'pk': job.pk}))
+        self.assertEqual(response.data['status'], 'running')
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+
+    @override_settings(QUIZ_JOB_STALE_SECONDS=300)
+    def test_orphaned_job_is_failed_and_can_be_retried(self):
+        job = self.create_job(QuizGenerationJob.Status.RUNNING, age_seconds=3600)
+        other = self.create_job(QuizGenerationJob.Status.PENDING, age_seconds=3600)
+        response = self.client.get(reverse('quiz-job-detail', kwargs={'pk': job.pk}))
+        self.assertEqual(response.data['status'], 'failed')
+        # Only the polled job is touched; the heartbeat thread sweeps the others.
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'pending')
+
+        with mock.patch('quizz_app.api.views.enqueue_generation_job') as enqueue:
+            retry = self.client.post(reverse('quiz-job-retry', kwargs={'pk': job.pk}))
+        self.assertEqual(retry.status_code, 202)
+        self.assertEqual(retry.data['status'], 'pending')
+        enqueue.assert_called_once()
+
+
+class TranscriptCacheTests(TestCase):
+    '''
+    Transcripts are shared between the URL variants of a video and evicted least recently used first.
+    '''
+    def test_url_variants_share_one_key(self):
+        variants = (
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=30',
+            'https://youtu.be/dQw4w9WgXcQ?si=share',
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123&index=2',
+        )
+        self.assertEqual({canonical_video_key(url) for url in variants}, {'Youtube:dQw4w9WgXcQ'})
+        self.assertIsNone(canonical_video_key('https://www.youtube.com/playlist?list=PL123'))
+
+    def test_hit_is_counted(self):
+        self.assertIsNone(get_cached_transcript('Youtube:abc'))
+        store_transcript('Youtube:abc', 'A transcript.', 12.5, source='captions')
+        entry = get_cached_transcript('Youtube:abc')
+        self.assertEqual(entry.transcript, 'A transcript.')
+        self.assertEqual(entry.source, 'captions')
+        self.assertEqual(TranscriptCacheEntry.objects.get(video_key='Youtube:abc').hit_count, 1)
+
+    @override_settings(TRANSCRIPT_CACHE_MAX_BYTES=25)
+    def test_least_recently_used_entries_are_evicted(self):
+        store_transcript('Youtube:old', 'x' * 10, 1)
+        store_transcript('Youtube:used', 'x' * 10, 1)
+        TranscriptCacheEntry.objects.filter(video_key='Youtube:old').update(last_used_at=timezone.now() - timedelta(hours=2))
+        TranscriptCacheEntry.objects.filter(video_key='Youtube:used').update(last_used_at=timezone.now() - timedelta(hours=3))
+        get_cached_transcript('Youtube:used')
+        store_transcript('Youtube:new', 'x' * 10, 1)
+        self.assertEqual(set(TranscriptCacheEntry.objects.values_list('video_key', flat=True)), {'Youtube:used', 'Youtube:new'})
+
+    @override_settings(TRANSCRIPT_CACHE_MAX_BYTES=25)
+    def test_transcript_larger_than_the_cache_is_not_stored(self):
+        store_transcript('Youtube:long', 'x' * 26, 1)
+        self.assertFalse(TranscriptCacheEntry.objects.exists())
+
+
+# Cached responses stay in memory, away from the file cache of a running server.
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-responses'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class QuizListPaginationTests(APITestMixin, TestCase):
+    '''
+    The quiz list is paged with a cursor over the user's own quizzes, newest first.
+    '''
+    def setUp(self):
+        super().setUp()
+        get_cache().clear()
+        self.quizzes = [Quiz.objects.create(owner=self.user, title=f'Quiz {index}', description='') for index in range(5)]
+        Question.objects.create(quiz=self.quizzes[0], question_title='Q?', question_options=['a', 'b', 'c', 'd'], answer='a')
+        other = User.objects.create_user(username='other-user', password='secret')
+        Quiz.objects.create(owner=other, title='Not mine', description='')
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids += [quiz['id'] for quiz in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_every_quiz_once_newest_first(self):
+        ids = self.collect(reverse('quiz-list') + '?page_size=2')
+        self.assertEqual(ids, [quiz.pk for quiz in reversed(self.quizzes)])
+
+    def test_summaries_by_default_and_questions_on_request(self):
+        summary = self.client.get(reverse('quiz-list')).data['results'][-1]
+        self.assertEqual(summary['question_count'], 1)
+        self.assertNotIn('questions', summary)
+        full = self.client.get(reverse('quiz-list') + '?include=questions').data['results'][-1]
+        self.assertEqual([question['question_title'] for question in full['questions']], ['Q?'])
+
+    def test_quiz_created_between_pages_does_not_shift_the_next_page(self):
+        first = self.client.get(reverse('quiz-list') + '?page_size=2')
+        with self.captureOnCommitCallbacks(execute=True):
+            Quiz.objects.create(owner=self.user, title='Newer', description='')
+        ids = [quiz['id'] for quiz in first.data['results']] + self.collect(first.data['next'])
+        self.assertEqual(ids, [quiz.pk for quiz in reversed(self.quizzes)])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class QuizResponseCacheTests(APITestMixin, TestCase):
+    '''
+    Cached quiz responses answer conditional requests with 304 until the quiz or its questions change.
+    '''
+    def setUp(self):
+        super().setUp()
+        get_cache().clear()
+        self.quiz = Quiz.objects.create(owner=self.user, title='Cells', description='')
+        self.question = Question.objects.create(quiz=self.quiz, question_title='Q?', question_options=['a', 'b', 'c', 'd'], answer='a')
+        self.detail_url = reverse('quiz-detail', kwargs={'pk': self.quiz.pk})
+
+    def test_matching_etag_is_not_modified(self):
+        for url in (reverse('quiz-list'), self.detail_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again['ETag'], response['ETag'])
+
+    def test_quiz_update_invalidates_list_and_detail(self):
+        etags = {url: self.client.get(url)['ETag'] for url in (reverse('quiz-list'), self.detail_url)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.patch(self.detail_url, {'title': 'Organelles'}, format='json').status_code, 200)
+        list_response = self.client.get(reverse('quiz-list'), HTTP_IF_NONE_MATCH=etags[reverse('quiz-list')])
+        self.assertEqual(list_response.status_code, 200)
+        self.assertEqual(list_response.data['results'][0]['title'], 'Organelles')
+        detail = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etags[self.detail_url])
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data['title'], 'Organelles')
+
+    def test_question_change_invalidates_the_question_count(self):
+        etag = self.client.get(reverse('quiz-list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.delete()
+        response = self.client.get(reverse('quiz-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['question_count'], 0)
+
+    def test_last_modified_once_the_version_is_a_second_old(self):
+        self.assertNotIn('Last-Modified', self.client.get(reverse('quiz-list')))
+        get_cache().set(list_version_key(self.user.pk), time.time_ns() - 5_000_000_000, timeout=None)
+        response = self.client.get(reverse('quiz-list'))
+        self.assertIn('Last-Modified', response)
+        again = self.client.get(reverse('quiz-list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+
+@override_settings(GENERATION_QUEUE_LIMIT=2, TRANSCRIPTION_SLOTS=2, AUDIO_MINUTES_PER_DAY=5, QUIZ_JOB_STALE_SECONDS=300)
+class GenerationAdmissionTests(APITestMixin, TestCase):
+    '''
+    Generation requests are refused with Retry-After when the queue is full or the audio budget is used up.
+    '''
+    video_url = 'https://www.youtube.com/watch?v=abc'
+
+    def setUp(self):
+        super().setUp()
+        self.preflight = {'success': True, 'url': self.video_url, 'title': 'Video', 'duration': 240, 'format_id': None, 'info': None}
+        for target, value in (('quizz_app.api.admission.preflight_video', self.preflight), ('quizz_app.api.views.enqueue_generation_job', None)):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create(self):
+        return self.client.post(reverse('quiz-create'), {'url': self.video_url}, format='json')
+
+    def queue_jobs(self, count, age_seconds=0):
+        other = User.objects.create_user(username=f'queued-{age_seconds}', password='secret')
+        for _ in range(count):
+            job = QuizGenerationJob.objects.create(owner=other, video_url=self.video_url)
+            QuizGenerationJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=age_seconds))
+
+    def test_full_queue_is_503_with_retry_after(self):
+        self.queue_jobs(2)
+        response = self.create()
+        self.assertEqual(response.status_code, 503)
+        # Two queued jobs of DEFAULT_JOB_SECONDS each, run two at a time.
+        self.assertEqual(response['Retry-After'], '120')
+        self.assertEqual(QuizGenerationJob.objects.filter(owner=self.user).count(), 0)
+
+    def test_orphaned_jobs_do_not_fill_the_queue(self):
+        self.queue_jobs(2, age_seconds=3600)
+        self.assertEqual(self.create().status_code, 202)
+
+    def test_used_up_audio_budget_is_429_with_retry_after(self):
+        self.assertEqual(self.create().status_code, 202)
+        response = self.create()
+        self.assertEqual(response.status_code, 429)
+        # 4 of 5 minutes are used; the 3 missing ones come back at one every 86400 / 5 seconds.
+        self.assertAlmostEqual(int(response['Retry-After']), 3 * 17280, delta=2)
+        self.assertEqual(QuizGenerationJob.objects.filter(owner=self.user).count(), 1)
+
+    def test_video_longer_than_the_budget_is_rejected(self):
+        self.preflight['duration'] = 6 * 60
+        response = self.create()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('url', response.data)
+
+
+@override_settings(QUIZ_QUESTION_COUNT=10, QUIZ_MIN_QUESTIONS=5, PIPELINE_CHECKPOINT_TTL_SECONDS=3600)
+class CheckpointResumeTests(TestCase):
+    '''
+    A retried generation resumes from the model output and the parsed quiz of the failed run.
+    '''
+    usage = {'prompt_tokens': 10, 'output_tokens': 10}
+    run_key = 'job:1'
+
+    def generate(self, chunks, outputs):
+        generate_many = mock.Mock()
+        run_async = mock.Mock(return_value=[(output, self.usage) for output in outputs])
+        stream_quiz = mock.Mock(return_value=(outputs[0], self.usage))
+        with mock.patch('quizz_app.api.utils.split_transcript', return_value=chunks), \
+                mock.patch('quizz_app.api.utils.stream_quiz', stream_quiz), \
+                mock.patch('quizz_app.api.utils.generate_many', generate_many), \
+                mock.patch('quizz_app.api.utils.run_async', run_async):
+            result = generate_quizes_using_genmini_ai('A transcript.', run_key=self.run_key)
+        return result, generate_many, stream_quiz
+
+    def test_parsed_quiz_is_returned_without_calling_the_model(self):
+        first, _, _ = self.generate(['A transcript.'], [quiz_json(valid=10)])
+        self.assertTrue(first['success'])
+        retry, _, stream_quiz = self.generate(['A transcript.'], [quiz_json(valid=10)])
+        stream_quiz.assert_not_called()
+        self.assertEqual(retry['resumed_from'], Stage.QUIZ)
+        self.assertEqual(retry['quiz_content'], first['quiz_content'])
+
+    def test_only_chunks_without_output_are_sent_again(self):
+        chunks = ['Part one.', 'Part two.']
+        # The second chunk fails and the run dies after the model step.
+        with mock.patch('quizz_app.api.utils.select_questions', side_effect=RuntimeError('worker lost')):
+            failed, generate_many, _ = self.generate(chunks, [quiz_json(valid=8, part=1), 'not json'])
+        self.assertFalse(failed['success'])
+        self.assertEqual(len(generate_many.call_args.args[0]), 2)
+
+        retry, generate_many, _ = self.generate(chunks, [quiz_json(valid=8, part=2)])
+        self.assertTrue(retry['success'])
+        self.assertEqual(retry['resumed_from'], Stage.LLM_OUTPUT)
+        prompts = generate_many.call_args.args[0]
+        self.assertEqual(len(prompts), 1)
+        self.assertIn('Part two.', prompts[0])
+        titles = {question['question_title'] for question in retry['quiz_content']['questions']}
+        self.assertTrue(any(title.startswith('Question 1.') for title in titles))
+        self.assertTrue(any(title.startswith('Question 2.') for title in titles))
+
+    def test_expired_checkpoints_are_ignored_and_purged(self):
+        save_checkpoint(self.run_key, Stage.QUIZ, {'quiz': {}, 'usage': {}})
+        PipelineCheckpoint.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(load_checkpoint(self.run_key, Stage.QUIZ))
+        save_checkpoint('job:2', Stage.QUIZ, {'quiz': {}, 'usage': {}})
+        self.assertEqual(list(PipelineCheckpoint.objects.values_list('key', flat=True)), ['job:2'])